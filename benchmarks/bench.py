@@ -0,0 +1,229 @@
+"""
+Benchmarks for the tax engines and the finance.constants Age/FREQ utilities.
+
+    python benchmarks/bench.py                          # run with the default sizes
+    python benchmarks/bench.py --sizes 1000 10000000    # pick the data sizes
+    python benchmarks/bench.py --save                   # store the results as the baseline
+    python benchmarks/bench.py --compare                # flag results slower than the baseline
+    python benchmarks/bench.py --import_budget          # check cold import times against IMPORT_BUDGETS
+
+Data is generated from a fixed seed so runs are comparable. Every benchmark reports the best of --repeat runs.
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from finance.constants import Age, FREQ, to_freq  # noqa: E402
+from finance.age_array import AgeArray  # noqa: E402
+from tax.income_tax import IncomeTax, FilingStatus  # noqa: E402
+from tax.capital_gain_tax import CapitalGainTax, Operation, Transaction  # noqa: E402
+from tax.social_security_tax import SocialSecurityTax  # noqa: E402
+from tax.transaction_table import TransactionTable  # noqa: E402
+from tax.vectorized import tax_due_array  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = [1000, 10000, 100000]
+# pure Python per-object loops get slow quickly, cap them unless asked otherwise
+SCALAR_MAX_SIZE = 1000000
+# cold import time allowed per module, in seconds, excluding the interpreter's own startup
+IMPORT_BUDGETS = {
+    'tax': 0.005,
+    'tax.income_tax': 0.02,
+    'finance.constants': 0.015,
+}
+
+
+def make_incomes(n, rng):
+    return [rng.randint(0, 800000) for _ in range(n)]
+
+
+def make_transactions(n, rng):
+    transactions = list()
+    day = date(2000, 1, 1)
+    held = 0
+    for _ in range(n):
+        day += timedelta(days=rng.randint(0, 1))
+        if held < 100 or rng.random() < 0.5:
+            quantity = rng.randint(1, 100)
+            held += quantity
+            transactions.append(Transaction(day, Operation.BUY, quantity, rng.uniform(10, 50)))
+        else:
+            quantity = rng.randint(1, held)
+            held -= quantity
+            transactions.append(Transaction(day, Operation.SELL, quantity, rng.uniform(10, 50)))
+    return transactions
+
+
+def make_ages(n, rng):
+    return [Age(rng.randint(0, 100), rng.randint(0, 11), rng.randint(0, 29)) for _ in range(n)]
+
+
+def bench_income_tax_per_call(n, rng):
+    incomes = make_incomes(n, rng)
+    return lambda: [IncomeTax(income, FilingStatus.SINGLE).tax_due for income in incomes]
+
+
+def bench_income_tax_batch(n, rng):
+    incomes = np.array(make_incomes(n, rng), dtype=np.float64)
+    return lambda: tax_due_array(incomes, FilingStatus.SINGLE.value)
+
+
+def bench_fifo_capital_gains(n, rng):
+    transactions = make_transactions(n, rng)
+    return lambda: CapitalGainTax(transactions).calculate_fifo_capital_gains()
+
+
+def bench_fifo_capital_gains_table(n, rng):
+    table = TransactionTable.from_transactions(make_transactions(n, rng))
+    return lambda: CapitalGainTax(table).calculate_fifo_capital_gains()
+
+
+def bench_social_security_taxable_percentage(n, rng):
+    incomes = make_incomes(n, rng)
+    return lambda: [SocialSecurityTax(income / 10, FilingStatus.SINGLE).taxable_percentage() for income in incomes]
+
+
+def bench_age_compare(n, rng):
+    ages = make_ages(n, rng)
+    threshold = Age(59, 6, 0)
+    return lambda: [age >= threshold for age in ages]
+
+
+def bench_age_subtract(n, rng):
+    ages = make_ages(n, rng)
+    full_retirement_age = Age(67, 0, 0)
+    return lambda: [full_retirement_age - age for age in ages]
+
+
+def bench_age_array_compare(n, rng):
+    ages = AgeArray.from_ages(make_ages(n, rng))
+    threshold = Age(59, 6, 0)
+    return lambda: ages >= threshold
+
+
+def bench_to_freq(n, rng):
+    days = [rng.randint(0, 20000) for _ in range(n)]
+    return lambda: [to_freq(d, FREQ.MONTH) for d in days]
+
+
+# name -> (setup, whether it loops over Python objects per item)
+BENCHMARKS = {
+    'income_tax_per_call': (bench_income_tax_per_call, True),
+    'income_tax_batch': (bench_income_tax_batch, False),
+    'fifo_capital_gains': (bench_fifo_capital_gains, True),
+    'fifo_capital_gains_table': (bench_fifo_capital_gains_table, False),
+    'social_security_taxable_percentage': (bench_social_security_taxable_percentage, True),
+    'age_compare': (bench_age_compare, True),
+    'age_subtract': (bench_age_subtract, True),
+    'age_array_compare': (bench_age_array_compare, False),
+    'to_freq': (bench_to_freq, True),
+}
+
+
+def run(names, sizes, repeat, max_scalar_size):
+    results = dict()
+    for name in names:
+        setup, per_object = BENCHMARKS[name]
+        for n in sizes:
+            if per_object and n > max_scalar_size:
+                continue
+            fn = setup(n, random.Random(n))
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - start)
+            key = f"{name}[{n}]"
+            results[key] = best
+            print(f"{key:<50} {best:>12.6f} s  {best / n * 1e9:>12.1f} ns/item", flush=True)
+    return results
+
+
+def import_time(module):
+    """
+    Cumulative import time of module in a fresh interpreter, from python -X importtime.
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1e6
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def check_import_budgets(repeat):
+    over_budget = list()
+    for module, budget in IMPORT_BUDGETS.items():
+        seconds = min(import_time(module) for _ in range(repeat))
+        print(f"import {module:<44} {seconds:>12.6f} s  budget {budget:.6f} s")
+        if seconds > budget:
+            over_budget.append(module)
+    return over_budget
+
+
+def compare(results, baseline, tolerance):
+    regressions = list()
+    for key, seconds in results.items():
+        if key not in baseline:
+            continue
+        ratio = seconds / baseline[key]
+        if ratio > 1 + tolerance:
+            regressions.append(key)
+        print(f"{key:<50} {baseline[key]:>12.6f} -> {seconds:>12.6f} s  x{ratio:.2f}")
+    return regressions
+
+
+def cli():
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument("--only", choices=list(BENCHMARKS), nargs='+', default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max_scalar_size", type=int, default=SCALAR_MAX_SIZE,
+                        help="largest size for the per-object benchmarks")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--compare", action="store_true", help="compare the results with the baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing --compare")
+    parser.add_argument("--import_budget", action="store_true", help="only check import times against IMPORT_BUDGETS")
+    args = parser.parse_args()
+
+    if args.import_budget:
+        over_budget = check_import_budgets(args.repeat)
+        if over_budget:
+            print(f"Over import time budget: {', '.join(over_budget)}")
+            sys.exit(1)
+        return
+
+    results = run(args.only, args.sizes, args.repeat, args.max_scalar_size)
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Slower than baseline by more than {args.tolerance*100:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+    if args.save:
+        baseline = dict()
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,128 @@
+import numpy as np
+
+from .constants import Age
+
+
+class AgeArray:
+    def __init__(self, days):
+        """
+        Array of ages stored as int32 total days, using the same approximation as Age._to_days
+        (365 days a year, 30 days a month). Comparisons and differences work on the whole array at once.
+        Arrays built from components or Age objects also keep the years, months and days as given, which need not
+        be normalized (e.g. Age(0, 13, 0)), so that in_months, to_ages, indexing and == agree with Age; an array
+        built from total days has the normalized components, as Age.__sub__ returns.
+        """
+        self.days = np.asarray(days, dtype=np.int32)
+        if np.any(self.days < 0):
+            raise ValueError("Ages must be non-negative.")
+        self._components = None
+
+    @classmethod
+    def from_components(cls, years=0, months=0, days=0):
+        components = [np.asarray(c) for c in (years, months, days)]
+        # as Age, reject rather than truncate non-integers
+        if any(c.dtype.kind not in 'iu' or np.any(c < 0) for c in components):
+            raise ValueError("Years, months, and days must be non-negative integers.")
+        components = [np.array(c) for c in np.broadcast_arrays(*(c.astype(np.int32) for c in components))]
+        ages = cls(components[0] * 365 + components[1] * 30 + components[2])
+        ages._components = tuple(components)
+        return ages
+
+    @classmethod
+    def from_ages(cls, ages):
+        ages = list(ages)
+        return cls.from_components(*(np.fromiter((getattr(age, field) for age in ages), dtype=np.int32,
+                                                 count=len(ages)) for field in ('years', 'months', 'days')))
+
+    @property
+    def years(self):
+        return self.days // 365 if self._components is None else self._components[0]
+
+    @property
+    def months(self):
+        return self.days % 365 // 30 if self._components is None else self._components[1]
+
+    @property
+    def remaining_days(self):
+        return self.days % 365 % 30 if self._components is None else self._components[2]
+
+    def in_months(self):
+        """
+        years*12 + months of each age, days ignored, as Age.in_months.
+        """
+        return self.years * 12 + self.months
+
+    def to_ages(self):
+        return [Age(*map(int, ymd)) for ymd in zip(self.years, self.months, self.remaining_days)]
+
+    def __len__(self):
+        return len(self.days)
+
+    def __getitem__(self, index):
+        if self._components is None:
+            days = self.days[index]
+            if np.ndim(days) == 0:
+                days = int(days)
+                return Age(days // 365, days % 365 // 30, days % 365 % 30)
+            return AgeArray(days)
+        components = [c[index] for c in self._components]
+        if np.ndim(components[0]) == 0:
+            return Age(*map(int, components))
+        return AgeArray.from_components(*components)
+
+    @staticmethod
+    def _other_days(other):
+        if isinstance(other, AgeArray):
+            return other.days
+        if isinstance(other, Age):
+            return other._to_days()
+        return None
+
+    def _compare(self, other, op):
+        other_days = self._other_days(other)
+        if other_days is None:
+            return NotImplemented
+        return op(self.days, other_days)
+
+    def __eq__(self, other):
+        """
+        Element-wise Age.__eq__: same years, months and days, not just the same total days.
+        """
+        if isinstance(other, Age):
+            other = (other.years, other.months, other.days)
+        elif isinstance(other, AgeArray):
+            other = (other.years, other.months, other.remaining_days)
+        else:
+            return NotImplemented
+        return ((self.years == other[0]) & (self.months == other[1]) & (self.remaining_days == other[2]))
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else ~equal
+
+    def __lt__(self, other):
+        return self._compare(other, np.less)
+
+    def __le__(self, other):
+        return self._compare(other, np.less_equal)
+
+    def __gt__(self, other):
+        return self._compare(other, np.greater)
+
+    def __ge__(self, other):
+        return self._compare(other, np.greater_equal)
+
+    def __sub__(self, other):
+        """
+        Approximate absolute difference, element-wise, as Age.__sub__ does.
+        """
+        other_days = self._other_days(other)
+        if other_days is None:
+            raise TypeError("Can only subtract Age or AgeArray objects from an AgeArray.")
+        return AgeArray(np.abs(self.days - other_days))
+
+    def __rsub__(self, other):
+        return self.__sub__(other)
+
+    def __repr__(self):
+        return f"AgeArray(days={self.days!r})"
@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+import numpy as np
+
+from .constants import FREQ
+
+# dates are datetime64[D]; stream is the index of the schedule each event came from, after a merge
+CashFlows = namedtuple('CashFlows', ['dates', 'amounts', 'stream'])
+
+# calendar-aligned frequencies step whole months instead of FREQ's approximate day counts
+_MONTH_STEPS = {FREQ.MONTH: 1, FREQ.QUARTER: 3, FREQ.YEAR: 12}
+
+
+def _event_dates(start, end, freq: FREQ):
+    if freq in _MONTH_STEPS:
+        step = _MONTH_STEPS[freq]
+        first_month = start.astype('datetime64[M]')
+        months = np.arange(first_month, end.astype('datetime64[M]') + 1, step)
+        # keep the start's day of month, clipped to the length of each month
+        month_lengths = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+        day = (start - first_month.astype('datetime64[D]')).astype(np.int64)
+        dates = months.astype('datetime64[D]') + np.minimum(day, month_lengths - 1)
+        return dates[dates <= end]
+    return np.arange(start, end + 1, freq.value, dtype='datetime64[D]')
+
+
+def cash_flow_schedule(start, end, freq: FREQ, amount, growth_rate=0.0, stream=0):
+    """
+    Expands a stream paying amount every freq from start to end (inclusive) into arrays of event dates and
+    amounts. Amounts grow by growth_rate a year. MONTH, QUARTER and YEAR events fall on the start's day of the
+    month and compound on whole periods since start (e.g. a YEAR stream grows by exactly growth_rate each
+    event); DAY, WEEK and BI_WEEK step in days and compound by the fraction of a 365-day year since start.
+    """
+    start = np.datetime64(start, 'D')
+    end = np.datetime64(end, 'D')
+    dates = _event_dates(start, end, freq)
+    if freq in _MONTH_STEPS:
+        elapsed_years = np.arange(len(dates)) * _MONTH_STEPS[freq] / 12
+    else:
+        elapsed_years = (dates - start).astype(np.float64) / FREQ.YEAR.value
+    amounts = amount * (1 + growth_rate) ** elapsed_years
+    return CashFlows(dates, amounts, np.full(len(dates), stream, dtype=np.int32))
+
+
+def merge_schedules(schedules):
+    """
+    Merges CashFlows into one timeline sorted by date; events on the same date keep the order of schedules.
+    """
+    schedules = list(schedules)
+    if not schedules:
+        return CashFlows(np.array([], dtype='datetime64[D]'), np.array([], dtype=np.float64),
+                         np.array([], dtype=np.int32))
+    dates = np.concatenate([s.dates for s in schedules])
+    order = np.argsort(dates, kind='stable')
+    return CashFlows(dates[order], np.concatenate([s.amounts for s in schedules])[order],
+                     np.concatenate([s.stream for s in schedules])[order])
+
+
+def cash_flow_schedules(streams):
+    """
+    Builds and merges many streams, each a (start, end, freq, amount, growth_rate) tuple. The stream column of
+    the result holds each event's index in streams.
+    """
+    return merge_schedules(cash_flow_schedule(*stream, stream=i) for i, stream in enumerate(streams))
+
+
+def net_by_date(cash_flows: CashFlows):
+    """
+    Sums the amounts of a merged timeline per date. Returns (unique dates, net amounts).
+    """
+    dates, first = np.unique(cash_flows.dates, return_index=True)
+    if not len(dates):
+        return dates, cash_flows.amounts[:0]
+    return dates, np.add.reduceat(cash_flows.amounts, first)
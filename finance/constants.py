@@ -1,5 +1,4 @@
 from enum import Enum
-from datetime import datetime
 
 
 class FREQ(Enum):
@@ -82,7 +81,8 @@ class Age:
         Returns a new Age object representing the difference.
         """
         if not isinstance(other, Age):
-            raise TypeError("Can only subtract Age objects from other Age objects.")
+            # lets e.g. AgeArray handle Age - AgeArray
+            return NotImplemented
 
         total_days_self = self._to_days()
         total_days_other = other._to_days()
@@ -107,7 +107,3 @@ class Age:
         Returns a developer-friendly string representation of the Age object.
         """
         return f"Age(years={self.years}, months={self.months}, days={self.days})"
-
-
-delta = Age(67, 0, 0) - Age(63, 6, 12)
-print(delta)
\ No newline at end of file
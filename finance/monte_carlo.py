@@ -0,0 +1,177 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from tax.income_tax import FilingStatus
+from tax.vectorized import household_tax_array
+
+# per path and year: end-of-year portfolio value, taxes paid, gross withdrawals, spending left unfunded
+SimulationResult = namedtuple('SimulationResult', ['balances', 'taxes', 'withdrawals', 'shortfalls'])
+
+# paths are simulated in blocks of this many, each with its own random stream, so results never depend on
+# how the paths are later split between processes
+BLOCK_SIZE = 4096
+
+
+def success_rate(result: SimulationResult):
+    """
+    Share of paths that funded every year's spending in full.
+    """
+    return float(np.mean(np.all(result.shortfalls <= 0, axis=1)))
+
+
+class RetirementSimulation:
+    def __init__(self, years, spending, taxable=0.0, taxable_basis=None, tax_deferred=0.0, roth=0.0,
+                 social_security_benefit=0.0, other_income=0.0, filing_status: FilingStatus = FilingStatus.SINGLE,
+                 expected_return=0.05, volatility=0.12, inflation=0.025, tax_iterations=6):
+        """
+        Simulates a retirement drawdown over years years. Each year the after-tax spending need (in today's
+        dollars, grown with inflation, like social_security_benefit and other_income) not covered by
+        Social Security and other income is withdrawn from the taxable, then tax-deferred, then Roth account,
+        grossed up for the taxes it triggers:
+        - ordinary income tax on other income, tax-deferred withdrawals and the taxable part of Social Security,
+        - long-term capital gains tax (stacked on top of ordinary income) and NIIT on the gain share of taxable
+          withdrawals (average basis),
+        with the brackets, benefit base amounts and NIIT thresholds grown with inflation.
+        The gross-up is solved with tax_iterations fixed-point passes, all paths at once; the last withdrawal covers
+        the last pass's taxes.
+        Yearly returns are lognormal with the given arithmetic mean and volatility, shared by all accounts.
+        """
+        self.years = years
+        self.spending = spending
+        self.taxable = taxable
+        self.taxable_basis = taxable if taxable_basis is None else taxable_basis
+        self.tax_deferred = tax_deferred
+        self.roth = roth
+        self.social_security_benefit = social_security_benefit
+        self.other_income = other_income
+        self.filing_status = filing_status
+        self.expected_return = expected_return
+        self.volatility = volatility
+        self.inflation = inflation
+        self.tax_iterations = tax_iterations
+
+    def returns(self, n_paths, seed, block):
+        """
+        Yearly returns for the n_paths paths of one block, drawn from that block's own stream of seed.
+        """
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block,)))
+        sigma2 = np.log(1 + (self.volatility / (1 + self.expected_return)) ** 2)
+        mu = np.log(1 + self.expected_return) - sigma2 / 2
+        return np.expm1(mu + np.sqrt(sigma2) * rng.standard_normal((n_paths, self.years)))
+
+    def simulate(self, returns, out: SimulationResult = None):
+        """
+        Runs every path of a (paths, years) returns array, writing into out if given.
+        """
+        n_paths = len(returns)
+        if out is None:
+            out = SimulationResult(*(np.empty((n_paths, self.years)) for _ in SimulationResult._fields))
+        taxable = np.full(n_paths, float(self.taxable))
+        basis = np.full(n_paths, float(self.taxable_basis))
+        tax_deferred = np.full(n_paths, float(self.tax_deferred))
+        roth = np.full(n_paths, float(self.roth))
+        for year in range(self.years):
+            inflation = (1 + self.inflation) ** year
+            social_security_benefit = self.social_security_benefit * inflation
+            other_income = self.other_income * inflation
+            need = max(self.spending * inflation - social_security_benefit - other_income, 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                gain_share = np.where(taxable > 0, np.clip(1 - basis / taxable, 0, 1), 0.0)
+
+            taxes = np.zeros(n_paths)
+            for iteration in range(self.tax_iterations + 1):
+                remaining = need + taxes
+                from_taxable = np.minimum(remaining, taxable)
+                remaining = remaining - from_taxable
+                from_tax_deferred = np.minimum(remaining, tax_deferred)
+                remaining = remaining - from_tax_deferred
+                from_roth = np.minimum(remaining, roth)
+                if iteration < self.tax_iterations:
+                    # the brackets are in today's dollars, so tax the deflated amounts and inflate the result
+                    taxes = inflation * household_tax_array((other_income + from_tax_deferred) / inflation,
+                                                            from_taxable * gain_share / inflation,
+                                                            self.filing_status, social_security_benefit / inflation,
+                                                            stack_gains=True)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                basis = np.where(taxable > 0, basis * (1 - from_taxable / taxable), 0.0)
+            taxable = taxable - from_taxable
+            tax_deferred = tax_deferred - from_tax_deferred
+            roth = roth - from_roth
+
+            growth = 1 + returns[:, year]
+            taxable *= growth
+            tax_deferred *= growth
+            roth *= growth
+
+            withdrawals = from_taxable + from_tax_deferred + from_roth
+            out.balances[:, year] = taxable + tax_deferred + roth
+            out.taxes[:, year] = taxes
+            out.withdrawals[:, year] = withdrawals
+            out.shortfalls[:, year] = np.maximum(need + taxes - withdrawals, 0)
+        return out
+
+    def run_blocks(self, out: SimulationResult, seed, blocks):
+        """
+        Simulates the given blocks of out's paths; block b covers rows b*BLOCK_SIZE up to the next block.
+        """
+        n_paths = len(out.balances)
+        for block in blocks:
+            start = block * BLOCK_SIZE
+            stop = min(start + BLOCK_SIZE, n_paths)
+            self.simulate(self.returns(stop - start, seed, block), SimulationResult(*(a[start:stop] for a in out)))
+
+    def run(self, n_paths, seed=0):
+        """
+        Simulates n_paths paths in blocks of BLOCK_SIZE and returns a SimulationResult of (n_paths, years) arrays.
+        """
+        out = SimulationResult(*(np.empty((n_paths, self.years)) for _ in SimulationResult._fields))
+        self.run_blocks(out, seed, range(_n_blocks(n_paths)))
+        return out
+
+
+def _n_blocks(n_paths):
+    return -(-n_paths // BLOCK_SIZE)
+
+
+def _attach(buffer, n_paths, years):
+    shape = (len(SimulationResult._fields), n_paths, years)
+    return SimulationResult(*np.ndarray(shape, dtype=np.float64, buffer=buffer))
+
+
+def _run_shared(simulation: RetirementSimulation, name, n_paths, seed, blocks):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        simulation.run_blocks(_attach(shm.buf, n_paths, simulation.years), seed, blocks)
+    finally:
+        shm.close()
+
+
+def run_parallel(simulation: RetirementSimulation, n_paths, seed=0, max_workers=None):
+    """
+    Same result as simulation.run(n_paths, seed), bit for bit, with the blocks spread over a process pool of
+    max_workers processes (None uses every CPU, 1 runs in this process). Workers write their paths straight
+    into a shared memory block, so only block numbers are pickled.
+    """
+    n_blocks = _n_blocks(n_paths)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or n_blocks < 2:
+        return simulation.run(n_paths, seed)
+    size = len(SimulationResult._fields) * n_paths * simulation.years * np.dtype(np.float64).itemsize
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        # a few contiguous runs of blocks per worker evens out the load without a task per block
+        n_tasks = min(n_blocks, 4 * max_workers)
+        tasks = [range(n_blocks * i // n_tasks, n_blocks * (i + 1) // n_tasks) for i in range(n_tasks)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for future in [executor.submit(_run_shared, simulation, shm.name, n_paths, seed, blocks)
+                           for blocks in tasks]:
+                future.result()
+        return SimulationResult(*(a.copy() for a in _attach(shm.buf, n_paths, simulation.years)))
+    finally:
+        shm.close()
+        shm.unlink()
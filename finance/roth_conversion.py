@@ -0,0 +1,131 @@
+from collections import namedtuple
+
+import numpy as np
+
+from tax.capital_gain_tax import long_term_tax_schedules
+from tax.income_tax import FilingStatus, income_tax_schedules
+from tax.social_security_tax import benefit_taxation_parameters
+from tax.vectorized import _benefit_tiers, household_tax_array
+
+# conversion amounts and the extra tax they cost, same shape as the incomes planned
+RothConversions = namedtuple('RothConversions', ['amounts', 'tax_cost'])
+
+_STATUSES = list(FilingStatus)
+# filing statuses and their values -> index in _STATUSES
+_STATUS_CODES = {key: code for code, status in enumerate(_STATUSES) for key in (status, status.value)}
+_STATUS_VALUES = np.array([status.value for status in _STATUSES])
+
+# one row per filing status, in _STATUSES order
+_income_tax_tops = np.array([income_tax_schedules[status].upper_bounds[:-1] for status in _STATUSES],
+                            dtype=np.float64)
+_long_term_tops = np.array([long_term_tax_schedules[status].upper_bounds[:-1] for status in _STATUSES],
+                           dtype=np.float64)
+_benefit_parameters = np.array([benefit_taxation_parameters(status) for status in _STATUSES], dtype=np.float64)
+
+
+def _status_codes(filing_status):
+    """
+    Index in _STATUSES of a single filing status, or an integer array of them for an array of filing statuses
+    (members or values). Arrays of values are mapped through their few distinct values with np.unique.
+    """
+    if isinstance(filing_status, (FilingStatus, str)):
+        return _STATUSES.index(FilingStatus(filing_status))
+    statuses = np.asarray(filing_status)
+    if statuses.dtype == object:
+        # members are not orderable, so np.unique cannot sort them; one dict lookup each instead
+        return np.fromiter(map(_STATUS_CODES.__getitem__, statuses.ravel()), dtype=np.intp,
+                           count=statuses.size).reshape(statuses.shape)
+    names, inverse = np.unique(statuses, return_inverse=True)
+    return np.array([_STATUS_CODES[name] for name in names], dtype=np.intp)[inverse].reshape(statuses.shape)
+
+
+def _income_to_reach(targets, long_term_gains, benefits, codes, stack_gains):
+    """
+    Ordinary income y (before Social Security) at which y + taxable benefits, plus the gains if stack_gains,
+    reaches each target. Taxable benefits are piecewise linear in y, so y is found exactly by inverting
+    between their breakpoints. targets has one more trailing axis than the other arrays; codes are the
+    filing statuses from _status_codes.
+    """
+    base_amount, adjusted_base_amount, first_rate, second_rate = np.moveaxis(_benefit_parameters[codes], -1, 0)
+    first_tier_cap = np.minimum(first_rate * benefits, first_rate * (adjusted_base_amount - base_amount))
+    # combined incomes where a tier starts or hits its cap
+    breakpoints = np.stack(np.broadcast_arrays(base_amount, adjusted_base_amount, base_amount + benefits,
+                                               adjusted_base_amount + benefits - first_tier_cap / second_rate),
+                           axis=-1)
+    incomes = np.sort(breakpoints - (long_term_gains + 0.5 * benefits)[..., None], axis=-1)
+    # taxable_benefits_array with the parameters already gathered per household, combined income rounded alike
+    combined_incomes = np.round(incomes + (long_term_gains + 0.5 * benefits)[..., None], 2)
+    reached = incomes + _benefit_tiers(benefits[..., None], combined_incomes, base_amount[..., None],
+                                       adjusted_base_amount[..., None], first_rate[..., None], second_rate[..., None])
+    if stack_gains:
+        reached = reached + long_term_gains[..., None]
+
+    # segment k of each target lies between breakpoints k - 1 and k; below the first and past the last the slope is 1
+    segment = np.sum(reached[..., None, :] <= targets[..., :, None], axis=-1)
+    lower = np.maximum(segment - 1, 0)
+    upper = np.minimum(segment, incomes.shape[-1] - 1)
+    x0, x1 = np.take_along_axis(incomes, lower, -1), np.take_along_axis(incomes, upper, -1)
+    y0, y1 = np.take_along_axis(reached, lower, -1), np.take_along_axis(reached, upper, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where((segment > 0) & (segment < incomes.shape[-1]) & (y1 > y0), (x1 - x0) / (y1 - y0), 1.0)
+    start, start_reached = np.where(segment == 0, x1, x0), np.where(segment == 0, y1, y0)
+    return start + (targets - start_reached) * slope
+
+
+def _headroom(tops, ordinary_incomes, filing_status, social_security_benefits, long_term_gains, stack_gains):
+    codes = _status_codes(filing_status)
+    ordinary_incomes, long_term_gains, benefits, codes = np.broadcast_arrays(
+        *(np.asarray(v, dtype=np.float64) for v in (ordinary_incomes, long_term_gains, social_security_benefits)),
+        codes)
+    if not codes.ndim:
+        codes = int(codes)
+    targets = np.broadcast_to(tops[codes], ordinary_incomes.shape + tops.shape[-1:])
+    incomes = _income_to_reach(targets, long_term_gains, benefits, codes, stack_gains)
+    return np.maximum(incomes - ordinary_incomes[..., None], 0)
+
+
+def bracket_headroom(ordinary_incomes, filing_status, social_security_benefits=0.0, long_term_gains=0.0):
+    """
+    Extra ordinary income (e.g. a Roth conversion) that brings each household's taxable ordinary income,
+    including the taxable part of its Social Security, to the top of every income tax bracket but the last.
+    Returns an array with one more trailing axis than the inputs, zero for brackets already passed.
+    Gains count toward the combined income of the benefits worksheet. filing_status as in tax_due_array.
+    """
+    return _headroom(_income_tax_tops, ordinary_incomes, filing_status, social_security_benefits, long_term_gains,
+                     stack_gains=False)
+
+
+def long_term_headroom(ordinary_incomes, filing_status, social_security_benefits=0.0, long_term_gains=0.0):
+    """
+    As bracket_headroom, for the long-term capital gains brackets: extra ordinary income until the gains,
+    stacked on top of taxable ordinary income, reach the top of each long-term bracket but the last.
+    """
+    return _headroom(_long_term_tops, ordinary_incomes, filing_status, social_security_benefits, long_term_gains,
+                     stack_gains=True)
+
+
+def plan_roth_conversions(ordinary_incomes, filing_status, target_bracket, social_security_benefits=0.0,
+                          long_term_gains=0.0, tax_deferred_balances=None, long_term_bracket=None):
+    """
+    Roth conversion of each household and year (the last axis) that fills income tax bracket target_bracket,
+    an index into income_tax_brackets. With long_term_bracket, conversions also stop where the stacked gains
+    would leave that long-term bracket (0 keeps them in the 0% bracket). With tax_deferred_balances, one per
+    household, conversions stop once a household's balance is used up, earliest years first. tax_cost taxes
+    long-term gains stacked on top of ordinary income (see long_term_tax_array).
+    """
+    amounts = bracket_headroom(ordinary_incomes, filing_status, social_security_benefits,
+                               long_term_gains)[..., target_bracket]
+    if long_term_bracket is not None:
+        amounts = np.minimum(amounts, long_term_headroom(ordinary_incomes, filing_status, social_security_benefits,
+                                                         long_term_gains)[..., long_term_bracket])
+    if tax_deferred_balances is not None:
+        converted = np.minimum(np.cumsum(amounts, axis=-1), np.asarray(tax_deferred_balances)[..., None])
+        amounts = np.diff(converted, axis=-1, prepend=0)
+    if not isinstance(filing_status, (FilingStatus, str)):
+        filing_status = _STATUS_VALUES[_status_codes(filing_status)]
+    # long-term gains stacked on ordinary income, as long_term_headroom has them
+    tax_cost = (household_tax_array(np.add(ordinary_incomes, amounts), long_term_gains, filing_status,
+                                    social_security_benefits, stack_gains=True) -
+                household_tax_array(ordinary_incomes, long_term_gains, filing_status, social_security_benefits,
+                                    stack_gains=True))
+    return RothConversions(amounts, tax_cost)
@@ -0,0 +1,169 @@
+from collections import namedtuple
+
+import numpy as np
+
+from tax.income_tax import FilingStatus, income_tax_schedules
+from tax.vectorized import household_tax_array, tax_due_array
+
+# per year: withdrawals from each account (a negative taxable withdrawal is a deposit), taxes paid,
+# end-of-year total balance and the part of the Roth withdrawal the Roth account could not cover
+WithdrawalPlan = namedtuple('WithdrawalPlan', ['tax_deferred', 'taxable', 'roth', 'taxes', 'balances', 'shortfalls'])
+
+# cost of each dollar of Roth withdrawal the Roth account cannot cover, on top of the dollar itself, per year left
+# in the plan: more than any real withdrawal costs, and more the earlier it comes, so a plan spends the taxed
+# accounts down before it runs short
+SHORTFALL_PENALTY = 100.0
+
+
+def _per_year(value, years):
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (years,))
+
+
+def _interp_index(grid, values):
+    """
+    Lower grid index and weight of each value for linear interpolation, extrapolating past both ends.
+    """
+    idx = np.clip(np.searchsorted(grid, values, side='right') - 1, 0, len(grid) - 2)
+    return idx, (values - grid[idx]) / (grid[idx + 1] - grid[idx])
+
+
+def _interp2(values, d_grid, x_grid, d, x):
+    i, wd = _interp_index(d_grid, d)
+    j, wx = _interp_index(x_grid, x)
+    return ((1 - wd) * ((1 - wx) * values[i, j] + wx * values[i, j + 1]) +
+            wd * ((1 - wx) * values[i + 1, j] + wx * values[i + 1, j + 1]))
+
+
+class WithdrawalOptimizer:
+    def __init__(self, years, spending, taxable=0.0, taxable_basis=None, tax_deferred=0.0, roth=0.0,
+                 social_security_benefit=0.0, other_income=0.0, filing_status: FilingStatus = FilingStatus.SINGLE,
+                 real_return=0.03, grid_size=41, heir_liquidation_years=10, tax_iterations=6):
+        """
+        Chooses each year's withdrawals from the taxable, tax-deferred and Roth accounts that leave the most after-tax
+        wealth at the end of years years, i.e. the least lifetime tax. Amounts are in today's dollars, as the
+        brackets are, and all accounts earn real_return. spending, social_security_benefit and other_income are
+        after-tax spending and income per year, a number or one value per year.
+
+        Each year the plan picks the tax-deferred withdrawal, from grid_size fractions of the balance, the amounts
+        that fill each income tax bracket and the amount that, with the taxable account, covers the year; the rest
+        of the spending need and its taxes come from the taxable account, then the Roth account, and a surplus is
+        deposited in the taxable account. Backward
+        induction runs over a grid_size x grid_size grid of (tax-deferred, taxable) balances. Taxable withdrawals
+        realize long-term gains at the account's starting gain share, taxed stacked on top of ordinary income. The
+        tax-deferred balance left at the end is valued net of the tax of spreading it over heir_liquidation_years
+        years.
+        The Roth balance is not part of the grid: Roth withdrawals beyond what the account could hold (its starting
+        balance grown, in the backward induction; the actual balance, when following the plan) are shortfalls,
+        each dollar costing SHORTFALL_PENALTY more per year left.
+        """
+        self.years = years
+        self.spending = _per_year(spending, years)
+        self.taxable = taxable
+        self.taxable_basis = taxable if taxable_basis is None else taxable_basis
+        self.tax_deferred = tax_deferred
+        self.roth = roth
+        self.social_security_benefit = _per_year(social_security_benefit, years)
+        self.other_income = _per_year(other_income, years)
+        self.filing_status = filing_status
+        self.real_return = real_return
+        self.grid_size = grid_size
+        self.heir_liquidation_years = heir_liquidation_years
+        self.tax_iterations = tax_iterations
+        self.gain_share = min(max(1 - self.taxable_basis / taxable, 0.0), 1.0) if taxable > 0 else 0.0
+        growth = (1 + real_return) ** years
+        self._d_grid = np.linspace(0, max(tax_deferred * growth, 1.0), grid_size)
+        self._x_grid = np.linspace(0, max((taxable + tax_deferred) * growth, 1.0), grid_size)
+        self._fractions = np.linspace(0, 1, grid_size)
+        self._bracket_tops = np.array(income_tax_schedules[filing_status].upper_bounds[:-1], dtype=np.float64)
+        self._steps = dict()
+
+    def _step(self, tax_deferred, taxable, year):
+        """
+        Outcome of every candidate tax-deferred withdrawal for balances broadcastable to (n, 1, m), shape (n, c, m):
+        (tax-deferred, taxable, Roth withdrawals, taxes, next tax-deferred balances, next taxable balances).
+        """
+        social_security_benefit = self.social_security_benefit[year]
+        other_income = self.other_income[year]
+        need = self.spending[year] - social_security_benefit - other_income
+        fills = np.clip(self._bracket_tops - other_income, 0, None)
+        balances = tax_deferred[:, :, 0]
+        candidates = np.concatenate([self._fractions * balances, np.broadcast_to(fills, (len(balances), len(fills)))],
+                                    axis=1)
+        from_tax_deferred = np.minimum(candidates, balances)[:, :, None]
+        # plus the withdrawal that, with all of the taxable account, covers the need and its own taxes, so there is
+        # always a candidate that neither runs short nor overshoots while the money lasts
+        cover = np.zeros(np.broadcast_shapes(np.shape(tax_deferred), np.shape(taxable)))
+        for _ in range(4 * self.tax_iterations):
+            previous, cover = cover, np.clip(need - taxable + household_tax_array(
+                other_income + cover, taxable * self.gain_share, self.filing_status, social_security_benefit,
+                stack_gains=True), 0, tax_deferred)
+            if np.all(cover - previous < 1e-6):
+                break
+        from_tax_deferred = np.concatenate(np.broadcast_arrays(from_tax_deferred, cover), axis=1)
+        taxes = 0.0
+        for _ in range(self.tax_iterations):
+            from_taxable = np.clip(need + taxes - from_tax_deferred, 0, taxable)
+            taxes = household_tax_array(other_income + from_tax_deferred, from_taxable * self.gain_share,
+                                        self.filing_status, social_security_benefit, stack_gains=True)
+        remaining = need + taxes - from_tax_deferred
+        from_taxable = np.minimum(remaining, taxable)
+        from_roth = remaining - from_taxable
+        growth = 1 + self.real_return
+        return (from_tax_deferred, from_taxable, from_roth, taxes,
+                (tax_deferred - from_tax_deferred) * growth, (taxable - from_taxable) * growth)
+
+    def _grid_step(self, year):
+        # the outcomes on the grid only depend on the year's spending and income, so years sharing them share one
+        key = (self.spending[year], self.social_security_benefit[year], self.other_income[year])
+        if key not in self._steps:
+            self._steps[key] = self._step(self._d_grid[:, None, None], self._x_grid[None, None, :], year)
+        return self._steps[key]
+
+    def _terminal_values(self):
+        tax_deferred = self._d_grid[:, None]
+        heir_tax = self.heir_liquidation_years * tax_due_array(tax_deferred / self.heir_liquidation_years,
+                                                               self.filing_status)
+        return -(tax_deferred - heir_tax + self._x_grid[None, :]) / (1 + self.real_return) ** self.years
+
+    def _costs(self, step, year, next_values, roth):
+        """
+        Roth withdrawal in present value plus the penalty on the part over the Roth balance roth, plus the value of
+        the next state, lower is better.
+        """
+        from_roth, next_tax_deferred, next_taxable = step[2], step[4], step[5]
+        shortfall = np.maximum(from_roth - roth, 0)
+        return (from_roth / (1 + self.real_return) ** year + SHORTFALL_PENALTY * (self.years - year) * shortfall +
+                _interp2(next_values, self._d_grid, self._x_grid, next_tax_deferred, next_taxable))
+
+    def value_functions(self):
+        """
+        Values of every grid state at the start of each year and at the end, shape (years + 1, grid, grid).
+        """
+        values = np.empty((self.years + 1, self.grid_size, self.grid_size))
+        values[self.years] = self._terminal_values()
+        for year in reversed(range(self.years)):
+            # withdrawals only lower the Roth balance, so this is the most it can hold in the year
+            roth = self.roth * (1 + self.real_return) ** year
+            values[year] = self._costs(self._grid_step(year), year, values[year + 1], roth).min(axis=1)
+        return values
+
+    def optimize(self):
+        """
+        Returns the WithdrawalPlan following the optimal policy from the actual starting balances.
+        """
+        values = self.value_functions()
+        plan = WithdrawalPlan(*(np.zeros(self.years) for _ in WithdrawalPlan._fields))
+        tax_deferred, taxable, roth = float(self.tax_deferred), float(self.taxable), float(self.roth)
+        for year in range(self.years):
+            step = self._step(np.array([[[tax_deferred]]]), np.array([[[taxable]]]), year)
+            best = np.argmin(self._costs(step, year, values[year + 1], roth).ravel())
+            from_tax_deferred, from_taxable, from_roth, taxes, tax_deferred, taxable = \
+                (float(np.broadcast_to(a, step[0].shape).ravel()[best]) for a in step)
+            plan.shortfalls[year] = max(from_roth - roth, 0.0)
+            roth = max(roth - from_roth, 0.0) * (1 + self.real_return)
+            plan.tax_deferred[year] = from_tax_deferred
+            plan.taxable[year] = from_taxable
+            plan.roth[year] = from_roth
+            plan.taxes[year] = taxes
+            plan.balances[year] = tax_deferred + taxable + roth
+        return plan
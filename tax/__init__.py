@@ -1,8 +1,52 @@
-from .income_tax import ALL_FILING_STATUS, income_tax_brackets, IncomeTax, FilingStatus
-
-__all__ = [
-    "ALL_FILING_STATUS",
-    "income_tax_brackets",
-    "IncomeTax",
-    "FilingStatus"
-]
\ No newline at end of file
+"""
+Submodules are imported on first use of one of their names, so `import tax` stays cheap and NumPy is only
+loaded once a vectorized engine is needed.
+"""
+from importlib import import_module
+
+# name -> submodule that defines it
+_exports = {
+    "ALL_FILING_STATUS": "income_tax",
+    "income_tax_brackets": "income_tax",
+    "IncomeTax": "income_tax",
+    "FilingStatus": "income_tax",
+    "BracketSchedule": "income_tax",
+    "tax_due_array": "vectorized",
+    "average_tax_rate_array": "vectorized",
+    "income_tax_batch": "vectorized",
+    "income_for_net_array": "vectorized",
+    "marginal_rate_array": "vectorized",
+    "income_grid": "vectorized",
+    "rate_curves": "vectorized",
+    "taxable_benefits_array": "vectorized",
+    "long_term_rate_array": "vectorized",
+    "niit_rate_array": "vectorized",
+    "long_term_tax_array": "vectorized",
+    "household_tax_array": "vectorized",
+    "CapitalGainTax": "capital_gain_tax",
+    "LotRelief": "capital_gain_tax",
+    "Operation": "capital_gain_tax",
+    "RealizedGains": "capital_gain_tax",
+    "Transaction": "capital_gain_tax",
+    "WashSaleMatcher": "capital_gain_tax",
+    "TransactionTable": "transaction_table",
+    "PortfolioCapitalGainTax": "portfolio",
+    "SocialSecurityTax": "social_security_tax",
+    "calculate_combined_income": "social_security_tax",
+    "ScheduleRegistry": "schedules",
+    "get_schedule": "schedules",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_exports[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,8 +1,11 @@
-from typing import List
+import sys
+from typing import Iterable, List
 from enum import Enum
+import heapq
+from bisect import bisect_left, bisect_right
 from collections import deque, namedtuple
-from datetime import datetime
-from income_tax import IncomeTax, FilingStatus, income_tax_brackets
+from datetime import date, datetime
+from .income_tax import IncomeTax, FilingStatus, BracketSchedule, income_tax_schedules, select_schedule
 
 
 class Operation(Enum):
@@ -10,11 +13,122 @@ class Operation(Enum):
     SELL = "sell"
 
 
-# Read-only
-Transaction = namedtuple('Transaction', ['date', 'operation', 'quantity', 'price'])
+class LotRelief(Enum):
+    """
+    Which open purchase lots a sale is matched against.
+    """
+    FIFO = "fifo"  # oldest first
+    LIFO = "lifo"  # newest first
+    HIFO = "hifo"  # highest price first
+    AVERAGE_COST = "average_cost"  # average price of all open lots, holding period taken oldest first
+
+
+# Read-only, symbol is only needed when mixing securities (see portfolio.PortfolioCapitalGainTax)
+Transaction = namedtuple('Transaction', ['date', 'operation', 'quantity', 'price', 'symbol'], defaults=(None,))
+
+
+# One lot matched by a sale; long_term is True when the lot was held more than a year. wash_sale_disallowed is the
+# part of a loss deferred by the wash-sale rule, already left out of gain_loss (see WashSaleMatcher)
+RealizedGain = namedtuple('RealizedGain', ['sale_date', 'purchase_date', 'quantity', 'cost_basis', 'sale_proceeds',
+                                           'gain_loss', 'long_term', 'wash_sale_disallowed'], defaults=(0,))
+
+
+class RealizedGains:
+    def __init__(self, gains: Iterable[RealizedGain] = ()):
+        """
+        Sequence of RealizedGain that keeps the short-term and long-term totals up to date as gains are added.
+        """
+        self._gains = list()
+        self._array = None
+        self.short_term_gain_loss = 0
+        self.long_term_gain_loss = 0
+        self.extend(gains)
+
+    @classmethod
+    def from_numpy(cls, array, short_term_gain_loss=None, long_term_gain_loss=None):
+        """
+        Wraps a structured array of transaction_table.GAIN_DTYPE, e.g. from TransactionTable.fifo_capital_gains.
+        """
+        gains = cls()
+        gains._gains = None
+        gains._array = array
+        if short_term_gain_loss is None or long_term_gain_loss is None:
+            long_term = array['long_term']
+            short_term_gain_loss = array['gain_loss'][~long_term].sum().item()
+            long_term_gain_loss = array['gain_loss'][long_term].sum().item()
+        gains.short_term_gain_loss = short_term_gain_loss
+        gains.long_term_gain_loss = long_term_gain_loss
+        return gains
+
+    def _rows(self):
+        if self._gains is None:
+            self._gains = [RealizedGain(date.fromordinal(sale_date), date.fromordinal(purchase_date), *amounts)
+                           for sale_date, purchase_date, *amounts in self._array.tolist()]
+        return self._gains
+
+    def append(self, gain: RealizedGain):
+        self._rows().append(gain)
+        self._array = None
+        if gain.long_term:
+            self.long_term_gain_loss += gain.gain_loss
+        else:
+            self.short_term_gain_loss += gain.gain_loss
+
+    def extend(self, gains: Iterable[RealizedGain]):
+        for gain in gains:
+            self.append(gain)
+
+    def __len__(self):
+        return len(self._array) if self._gains is None else len(self._gains)
+
+    def __iter__(self):
+        return iter(self._rows())
+
+    def __getitem__(self, index):
+        return self._rows()[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, RealizedGains):
+            return NotImplemented
+        return self._rows() == other._rows()
+
+    def __repr__(self):
+        return f"RealizedGains(n={len(self)}, short_term_gain_loss={self.short_term_gain_loss}, " \
+               f"long_term_gain_loss={self.long_term_gain_loss})"
+
+    def to_numpy(self):
+        """
+        Returns the gains as a structured array of transaction_table.GAIN_DTYPE, dates as day ordinals.
+        """
+        if self._array is None:
+            import numpy as np
+            from .transaction_table import GAIN_DTYPE
+
+            self._array = np.array([(g.sale_date.toordinal(), g.purchase_date.toordinal(), g.quantity, g.cost_basis,
+                                     g.sale_proceeds, g.gain_loss, g.long_term, g.wash_sale_disallowed)
+                                    for g in self._gains],
+                                   dtype=GAIN_DTYPE)
+        return self._array
+
+    def to_arrow(self):
+        """
+        Returns the gains as a pyarrow.Table, dates as date32.
+        """
+        import numpy as np
+        import pyarrow as pa
+
+        array = self.to_numpy()
+        unix_epoch = date(1970, 1, 1).toordinal()
+        # date32 is days since the epoch as int32; pyarrow does not cast int64 to it
+        return pa.table({name: pa.array((array[name] - unix_epoch).astype(np.int32), type=pa.date32())
+                         if name.endswith('_date')
+                         else pa.array(array[name])
+                         for name in array.dtype.names})
 
 
 class UpdatableTransaction:
+    __slots__ = ('date', 'operation', 'quantity', 'price')
+
     def __init__(self, t:Transaction):
         self.date = t.date
         self.operation = t.operation
@@ -30,7 +144,7 @@ long_term_tax_brackets = {
     ],
     FilingStatus.MARRIED_JOINTLY: [
         (0, 97600, 0.0),
-        (96701, 600500, 0.15),
+        (97601, 600500, 0.15),
         (600501, float('inf'), 0.20),
     ],
     FilingStatus.MARRIED_SEPARATELY: [
@@ -45,113 +159,542 @@ long_term_tax_brackets = {
     ],
 }
 
+long_term_tax_schedules = {status: BracketSchedule(brackets) for status, brackets in long_term_tax_brackets.items()}
+
+
+NIIT_RATE = 0.0038
+
+niit_thresholds = {
+    FilingStatus.SINGLE: 200000,
+    FilingStatus.MARRIED_JOINTLY: 250000,
+    FilingStatus.MARRIED_SEPARATELY: 125000,
+    FilingStatus.HEAD_OF_HOUSEHOLD: 200000,
+}
+
 
 def niit_rate(income, filing_status: FilingStatus):
-    if ((filing_status == FilingStatus.SINGLE and income > 200000) or
-        (filing_status == FilingStatus.MARRIED_JOINTLY and income > 250000) or
-        (filing_status == FilingStatus.MARRIED_SEPARATELY and income > 125000) or
-        (filing_status == FilingStatus.HEAD_OF_HOUSEHOLD and income > 200000)
-    ):
-        return 0.0038
+    if income > niit_thresholds[filing_status]:
+        return NIIT_RATE
     else:
         return 0.0
 
 
-def get_long_term_rate(income, filing_status: FilingStatus):
-    for lower_bound, upper_bound, rate in long_term_tax_brackets[filing_status]:
-        if upper_bound >= income >= lower_bound:
-            return rate
+def get_long_term_rate(income, filing_status: FilingStatus, tax_year=None):
+    rate = select_schedule(long_term_tax_schedules, "long_term", filing_status, tax_year).rate_at(income)
+    if rate is not None:
+        return rate
     raise RuntimeError(f"No long-term tax bracket found for income=${income:,}, filing_status={filing_status}")
 
 
-def get_short_term_rate(income, filing_status: FilingStatus):
-    for lower_bound, upper_bound, rate in income_tax_brackets[filing_status]:
-        if upper_bound >= income >= lower_bound:
-            return rate
+def get_short_term_rate(income, filing_status: FilingStatus, tax_year=None):
+    rate = select_schedule(income_tax_schedules, "income", filing_status, tax_year).rate_at(income)
+    if rate is not None:
+        return rate
     raise RuntimeError(f"No short-term tax bracket found for income=${income:,}, filing_status={filing_status}")
 
 
+def stacked_long_term_tax(income, long_term_gain, filing_status: FilingStatus, tax_year=None):
+    """
+    Tax on long_term_gain stacked on top of the ordinary income, each slice of it at the rate of the long-term
+    bracket it falls in, so a gain straddling the 0%/15%/20% thresholds is split across them.
+    """
+    schedule = select_schedule(long_term_tax_schedules, "long_term", filing_status, tax_year)
+    return schedule.tax(income + max(long_term_gain, 0)) - schedule.tax(income)
+
+
+def tax_on_gains(short_term_gain_loss, long_term_gain_loss, itx: IncomeTax, verbose=False, stack_gains=False):
+    """
+    Tax owed on net short-term and long-term gains/losses, at the rates for the ordinary income in itx
+    (and its tax_year).
+    With stack_gains, long-term gains are taxed by stacked_long_term_tax instead of at the single rate of the
+    ordinary income, stacked on the ordinary income plus any net short-term gain; NIIT is unchanged.
+    """
+    my_niit_rate = niit_rate(itx.income, itx.filing_status)
+    long_term_rate = get_long_term_rate(itx.income, itx.filing_status, itx.tax_year)
+    short_term_rate = get_short_term_rate(itx.income, itx.filing_status, itx.tax_year)
+    # net short-term gains are ordinary income, so long-term gains stack on top of them
+    stack_base = itx.income + max(short_term_gain_loss, 0)
+
+    if verbose:
+        print(f"long_term_gain_loss = ${long_term_gain_loss:,}")
+        if stack_gains:
+            stacked_tax = stacked_long_term_tax(stack_base, long_term_gain_loss, itx.filing_status, itx.tax_year)
+            print(f"stacked long-term tax = ${stacked_tax:,.2f}")
+        else:
+            print(f"long_term_rate = {long_term_rate*100:.1f}%")
+        print(f"NIIT rate = {my_niit_rate*100:.1f}%")
+        print(f"short_term_gain_loss = ${short_term_gain_loss:,}")
+        print(f"short_term_rate = ${short_term_rate*100:.1f}%")
+
+    tax_owed = 0
+    if long_term_gain_loss > 0:
+        if stack_gains:
+            tax_owed += (stacked_long_term_tax(stack_base, long_term_gain_loss, itx.filing_status, itx.tax_year) +
+                         long_term_gain_loss * my_niit_rate)
+        else:
+            rate = long_term_rate + my_niit_rate
+            tax_owed += long_term_gain_loss * rate
+    else:
+        # it is a loss, offset short-term gain
+        short_term_gain_loss += long_term_gain_loss
+
+    if short_term_gain_loss > 0:
+        tax_owed += short_term_gain_loss * short_term_rate
+    elif short_term_gain_loss < 0:
+        tax_owed = max(-3000, short_term_gain_loss)
+        if short_term_gain_loss < -3000:
+            print(f"short-term loss carry-over: {short_term_gain_loss + 3000:,}", file=sys.stderr)
+    return round(tax_owed, 2)
+
+
+class LotLedger:
+    """
+    FIFO queue of open purchase lots. Lots are kept as the caller's read-only Transactions and a lot is only
+    copied, with its remaining quantity, when a sale consumes part of it.
+    """
+    def __init__(self, lots: Iterable[Transaction] = ()):
+        self._lots = deque(lots)
+
+    def __len__(self):
+        return len(self._lots)
+
+    def __iter__(self):
+        return iter(self._lots)
+
+    def add(self, lot: Transaction):
+        self._lots.append(lot)
+
+    def consume(self, quantity):
+        """
+        Takes up to quantity from the oldest lots, yielding (lot, matched_quantity) for each lot used.
+        """
+        while quantity > 0 and self._lots:
+            lot = self._lots[0]
+            matched_quantity = min(quantity, lot.quantity)
+            if lot.quantity > matched_quantity: # if purchase is not fully used, keep the remain portion
+                self._lots[0] = lot._replace(quantity=lot.quantity - matched_quantity)
+            else:
+                self._lots.popleft()
+            quantity -= matched_quantity
+            yield lot, matched_quantity
+
+
+class LifoLotLedger(LotLedger):
+    """
+    LotLedger that relieves the newest lots first.
+    """
+    def consume(self, quantity):
+        while quantity > 0 and self._lots:
+            lot = self._lots[-1]
+            matched_quantity = min(quantity, lot.quantity)
+            if lot.quantity > matched_quantity:
+                self._lots[-1] = lot._replace(quantity=lot.quantity - matched_quantity)
+            else:
+                self._lots.pop()
+            quantity -= matched_quantity
+            yield lot, matched_quantity
+
+
+class HifoLotLedger(LotLedger):
+    """
+    LotLedger that relieves the highest priced lots first, oldest first among equal prices.
+    Lots are kept in a heap, so each lot consumed costs O(log n).
+    """
+    def __init__(self, lots: Iterable[Transaction] = ()):
+        self._count = 0
+        self._lots = list()
+        for lot in lots:
+            self.add(lot)
+
+    def __iter__(self):
+        return (lot for _, _, lot in sorted(self._lots))
+
+    def add(self, lot: Transaction):
+        heapq.heappush(self._lots, (-lot.price, self._count, lot))
+        self._count += 1
+
+    def consume(self, quantity):
+        while quantity > 0 and self._lots:
+            key, count, lot = self._lots[0]
+            matched_quantity = min(quantity, lot.quantity)
+            if lot.quantity > matched_quantity:
+                # same price and count, so the heap order is unchanged
+                self._lots[0] = (key, count, lot._replace(quantity=lot.quantity - matched_quantity))
+            else:
+                heapq.heappop(self._lots)
+            quantity -= matched_quantity
+            yield lot, matched_quantity
+
+
+class AverageCostLotLedger(LotLedger):
+    """
+    LotLedger for the average cost method: every share is relieved at the average price of all open shares,
+    kept as a running total, while lots are still taken oldest first to decide the holding period.
+    """
+    def __init__(self, lots: Iterable[Transaction] = ()):
+        self._quantity = 0
+        self._cost = 0
+        super().__init__()
+        for lot in lots:
+            self.add(lot)
+
+    @property
+    def average_price(self):
+        return self._cost / self._quantity if self._quantity else 0
+
+    def add(self, lot: Transaction):
+        super().add(lot)
+        self._quantity += lot.quantity
+        self._cost += lot.quantity * lot.price
+
+    def consume(self, quantity):
+        average_price = self.average_price
+        for lot, matched_quantity in super().consume(quantity):
+            self._quantity -= matched_quantity
+            self._cost -= matched_quantity * average_price
+            yield lot._replace(price=average_price), matched_quantity
+        if not self._lots:
+            # drop rounding residue once every lot is gone
+            self._quantity = 0
+            self._cost = 0
+
+
+LOT_LEDGERS = {
+    LotRelief.FIFO: LotLedger,
+    LotRelief.LIFO: LifoLotLedger,
+    LotRelief.HIFO: HifoLotLedger,
+    LotRelief.AVERAGE_COST: AverageCostLotLedger,
+}
+
+
+def _match_sale(sale: Transaction, ledger: LotLedger):
+    """
+    Matches a sale against the lots the ledger relieves first, yielding one realized gain/loss per lot used.
+    """
+    for purchase, matched_quantity in ledger.consume(sale.quantity):
+        cost_basis = matched_quantity * purchase.price
+        sale_proceeds = matched_quantity * sale.price
+        gain_or_loss = sale_proceeds - cost_basis
+
+        holding_period = (sale.date - purchase.date).days
+        yield RealizedGain(sale.date, purchase.date, matched_quantity, cost_basis, sale_proceeds, gain_or_loss,
+                           holding_period > 365)
+
+
+WASH_SALE_DAYS = 30
+
+# an open lot that remembers which purchase it came from, so wash-sale basis adjustments can follow it
+_PurchaseLot = namedtuple('_PurchaseLot', Transaction._fields + ('purchase',))
+
+
+class WashSaleMatcher:
+    def __init__(self, purchases: Iterable[Transaction] = (), method: LotRelief = LotRelief.FIFO):
+        """
+        Matches transactions fed in date order (see _chronological_key) like iter_capital_gains, applying the
+        wash-sale rule: a loss is disallowed for as many shares as were bought within WASH_SALE_DAYS days before or
+        after the sale, each purchased share replacing at most one sold share, and shares disposed of before the sale
+        not counting. The disallowed loss and the sold shares' holding period move to the replacement shares and
+        show up when those are sold.
+        purchases is every purchase the transactions will contain, in the same order, so that a sale sees the
+        replacements bought after it. Their dates form a sorted index, searched with bisect; purchases with no
+        shares left to replace are skipped through path-compressed links, so each loss sale costs O(log n).
+        """
+        self._ledger = LOT_LEDGERS[method]()
+        self._purchase_dates = list()
+        self._replaceable = list()
+        # deque of (quantity, basis added per share, holding days carried over) per purchase, used up in order
+        self._adjustments = list()
+        # _next[i] is i while purchase i can still replace shares, else a link towards the next one that can
+        self._next = [0]
+        self._added = 0
+        self.last_loss_date = None
+        for purchase in purchases:
+            self._index(purchase)
+
+    def _index(self, purchase: Transaction):
+        self._purchase_dates.append(purchase.date.toordinal())
+        self._replaceable.append(purchase.quantity)
+        self._adjustments.append(deque())
+        self._next.append(len(self._next))
+
+    def _find(self, i):
+        root = i
+        while self._next[root] != root:
+            root = self._next[root]
+        while self._next[i] != root:
+            self._next[i], i = root, self._next[i]
+        return root
+
+    def _use(self, i, quantity):
+        self._replaceable[i] -= quantity
+        if self._replaceable[i] <= 0:
+            self._next[i] = i + 1
+
+    def add(self, purchase: Transaction):
+        if self._added == len(self._purchase_dates):
+            # appended after the index was built
+            self._index(purchase)
+        self._ledger.add(_PurchaseLot(*purchase, self._added))
+        self._added += 1
+
+    def _disallow(self, sale: Transaction, quantity, loss, holding_period):
+        """
+        Moves the loss of quantity sold shares onto replacement shares, returning the amount disallowed.
+        """
+        sale_day = sale.date.toordinal()
+        stop = bisect_right(self._purchase_dates, sale_day + WASH_SALE_DAYS)
+        per_share = -loss / quantity
+        remaining = quantity
+        i = self._find(bisect_left(self._purchase_dates, sale_day - WASH_SALE_DAYS))
+        while i < stop and remaining > 0:
+            replaced = min(remaining, self._replaceable[i])
+            self._adjustments[i].append((replaced, per_share, holding_period))
+            self._use(i, replaced)
+            remaining -= replaced
+            i = self._find(i)
+        self.last_loss_date = sale.date
+        return (quantity - remaining) * per_share
+
+    def _pieces(self, lot: _PurchaseLot, quantity):
+        """
+        Splits quantity shares of lot into (quantity, basis added per share, holding days carried over), replacement
+        shares first.
+        """
+        adjustments = self._adjustments[lot.purchase]
+        while quantity > 0 and adjustments:
+            replaced, per_share, holding_period = adjustments[0]
+            used = min(quantity, replaced)
+            if replaced > used:
+                adjustments[0] = (replaced - used, per_share, holding_period)
+            else:
+                adjustments.popleft()
+            quantity -= used
+            yield used, per_share, holding_period
+        if quantity > 0:
+            # shares that never replaced anything are gone and cannot replace a later loss either
+            self._use(lot.purchase, min(quantity, self._replaceable[lot.purchase]))
+            yield quantity, 0, 0
+
+    def match_sale(self, sale: Transaction):
+        """
+        As _match_sale, with wash-sale adjusted cost basis, holding period and gain/loss. Replacement shares of a lot
+        sold together are reported in one row per holding period class and gain or loss, carrying over the shortest
+        of their holding periods if the row's loss is washed again.
+        """
+        for lot, matched_quantity in self._ledger.consume(sale.quantity):
+            rows = dict()
+            for quantity, added_basis, carried_over in self._pieces(lot, matched_quantity):
+                holding_period = (sale.date - lot.date).days + carried_over
+                cost_basis = quantity * (lot.price + added_basis)
+                sale_proceeds = quantity * sale.price
+                key = (holding_period > 365, sale_proceeds < cost_basis)
+                if key in rows:
+                    total_quantity, total_cost_basis, total_sale_proceeds, shortest = rows[key]
+                    rows[key] = (total_quantity + quantity, total_cost_basis + cost_basis,
+                                 total_sale_proceeds + sale_proceeds, min(shortest, holding_period))
+                else:
+                    rows[key] = (quantity, cost_basis, sale_proceeds, holding_period)
+            for (long_term, loss), (quantity, cost_basis, sale_proceeds, holding_period) in rows.items():
+                gain_or_loss = sale_proceeds - cost_basis
+                disallowed = self._disallow(sale, quantity, gain_or_loss, holding_period) if loss else 0
+                yield RealizedGain(sale.date, lot.date, quantity, cost_basis, sale_proceeds, gain_or_loss + disallowed,
+                                   long_term, disallowed)
+
+
+def iter_capital_gains(transactions: Iterable[Transaction], method: LotRelief = LotRelief.FIFO):
+    """
+    Streaming matcher: consumes transactions already sorted by date and yields realized gains/losses
+    as each sale arrives. Only the open purchase lots are kept in memory, so the input can be any iterator.
+    A sale is matched against purchases seen before it, so same-day buys must precede the sale.
+    """
+    ledger = LOT_LEDGERS[method]()
+    last_date = None
+    for t in transactions:
+        if last_date is not None and t.date < last_date:
+            raise ValueError(f"Transactions must be sorted by date: {t.date} comes after {last_date}")
+        last_date = t.date
+        if t.operation == Operation.BUY:
+            ledger.add(t)
+        else:
+            yield from _match_sale(t, ledger)
+
+
+def iter_fifo_capital_gains(transactions: Iterable[Transaction]):
+    return iter_capital_gains(transactions, LotRelief.FIFO)
+
+
+def _chronological_key(t: Transaction):
+    # same-day purchases are matched before sales
+    return t.date, t.operation == Operation.SELL
+
+
+def _match_fifo(transactions: Iterable[Transaction]):
+    """
+    Matches every sale, in date order, against all purchases in date order.
+    Returns the realized gains, the ledger of lots left open and the sale quantity left unmatched.
+    """
+    _buys = list()
+    _sales = list()
+    for t in transactions:
+        (_buys if t.operation == Operation.BUY else _sales).append(t)
+    _gains_and_losses = RealizedGains()
+    unmatched_quantity = 0
+    # sort purchases by date
+    ledger = LotLedger(sorted(_buys, key=lambda x: x.date))
+    for sale in sorted(_sales, key=lambda x: x.date):
+        remaining_sale_quantity = sale.quantity
+        for gain in _match_sale(sale, ledger):
+            _gains_and_losses.append(gain)
+            remaining_sale_quantity -= gain.quantity
+        unmatched_quantity += remaining_sale_quantity
+
+    return _gains_and_losses, ledger, unmatched_quantity
+
+
 class CapitalGainTax:
-    def __init__(self, tr_list: List[Transaction], verbose=False):
+    def __init__(self, tr_list: List[Transaction], verbose=False, method: LotRelief = LotRelief.FIFO,
+                 stack_gains=False, wash_sales=False):
+        """
+        tr_list is a list of Transaction or a transaction_table.TransactionTable, which is matched column-wise.
+        method selects the lots each sale is matched against, see LotRelief.
+        stack_gains taxes long-term gains across the long-term brackets on top of ordinary income, see tax_on_gains.
+        wash_sales defers losses under the wash-sale rule, see WashSaleMatcher; sales then only draw on lots bought
+        on or before their date, whatever the method.
+        """
         self._transactions = tr_list
+        self._owns_transactions = False
         self.verbose = verbose
+        self._method = method
+        self.stack_gains = stack_gains
+        self._wash_sales = wash_sales
+        self.invalidate()
 
     @property
     def transactions(self):
         return [UpdatableTransaction(t) for t in self._transactions]
 
+    @property
+    def method(self):
+        return self._method
+
+    @method.setter
+    def method(self, method: LotRelief):
+        self._method = method
+        self.invalidate()
+
+    @property
+    def wash_sales(self):
+        return self._wash_sales
+
+    @wash_sales.setter
+    def wash_sales(self, wash_sales):
+        self._wash_sales = wash_sales
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Drops the matching state so the next calculate_capital_gains re-matches the full history.
+        """
+        self._gains = None
+        self._ledger = None
+        self._last_key = None
+        self._unmatched_quantity = 0
+
     def calculate_fifo_capital_gains(self):
-        _buys = [t for t in self.transactions if t.operation == Operation.BUY]
-        _sales = [t for t in self.transactions if t.operation == Operation.SELL]
-        _gains_and_losses = list()
-        # sort purchases by date
-        purchase_queue = deque(sorted(_buys, key=lambda x: x.date))
-        for sale in sorted(_sales, key=lambda x: x.date):
-            remaining_sale_quantity = sale.quantity
-            while remaining_sale_quantity > 0 and  purchase_queue:
-                oldest_purchase = purchase_queue.popleft()
-                matched_quantity = min(remaining_sale_quantity, oldest_purchase.quantity)
-                cost_basis = matched_quantity * oldest_purchase.price
-                sale_proceeds = matched_quantity * sale.price
-                gain_or_loss = sale_proceeds - cost_basis
+        if hasattr(self._transactions, 'fifo_capital_gains'):
+            # columnar TransactionTable
+            return self._transactions.fifo_capital_gains()
+        return _match_fifo(self._transactions)[0]
 
-                holding_period = (sale.date - oldest_purchase.date).days
-                if holding_period > 365:
-                    gain_type = "long-term"
-                else:
-                    gain_type = "short-term"
+    def calculate_capital_gains(self):
+        """
+        Realized gains/losses using self.method. FIFO matches like calculate_fifo_capital_gains; the other
+        methods walk the transactions in date order, so a sale only draws on lots bought on or before its date.
+        The result is kept and updated in place by add_transaction.
+        """
+        if self._gains is None:
+            self._rebuild()
+        return self._gains
 
-                _gains_and_losses.append({"sale_date": sale.date, "purchase_date": oldest_purchase.date,
-                                          "quantity": matched_quantity, "cost_basis": cost_basis,
-                                          "sale_proceeds": sale_proceeds, "gain_loss": gain_or_loss,
-                                          "tax_type": gain_type})
-                remaining_sale_quantity -= matched_quantity
-                if oldest_purchase.quantity > matched_quantity: # if purchase is not fully used
-                    oldest_purchase.quantity -= matched_quantity
-                    purchase_queue.appendleft(oldest_purchase) # put the remain portion back
+    def _rebuild(self):
+        self.invalidate()
+        transactions = self._transactions
+        if self.wash_sales:
+            if hasattr(transactions, 'to_transactions'):
+                transactions = transactions.to_transactions()
+            transactions = sorted(transactions, key=_chronological_key)
+            self._gains = RealizedGains()
+            self._ledger = WashSaleMatcher((t for t in transactions if t.operation == Operation.BUY), self.method)
+            for t in transactions:
+                self._apply(t)
+            return
+        if self.method == LotRelief.FIFO and hasattr(transactions, 'fifo_capital_gains'):
+            # no open-lot state, add_transaction will switch to a list and rebuild
+            self._gains = transactions.fifo_capital_gains()
+            return
+        if hasattr(transactions, 'to_transactions'):
+            transactions = transactions.to_transactions()
+        if self.method == LotRelief.FIFO:
+            self._gains, self._ledger, self._unmatched_quantity = _match_fifo(transactions)
+            self._last_key = max(map(_chronological_key, transactions), default=None)
+            return
+        self._gains = RealizedGains()
+        self._ledger = LOT_LEDGERS[self.method]()
+        for t in sorted(transactions, key=_chronological_key):
+            self._apply(t)
 
-        return _gains_and_losses
+    def _apply(self, t: Transaction):
+        self._last_key = _chronological_key(t)
+        if t.operation == Operation.BUY:
+            self._ledger.add(t)
+            return
+        remaining_sale_quantity = t.quantity
+        for gain in (self._ledger.match_sale(t) if self.wash_sales else _match_sale(t, self._ledger)):
+            self._gains.append(gain)
+            remaining_sale_quantity -= gain.quantity
+        self._unmatched_quantity += remaining_sale_quantity
 
-    def tax_due(self, itx: IncomeTax):
-        my_niit_rate = niit_rate(itx.income, itx.filing_status)
-        gains_and_losses = self.calculate_fifo_capital_gains()
-        short_term_gain_loss = 0
-        long_term_gain_loss = 0
-        for gl in gains_and_losses:
-            if gl['tax_type'] == "long-term":
-                long_term_gain_loss += gl['gain_loss']
-            else:
-                # gl['tax_type'] == "short-term"
-                short_term_gain_loss += gl['gain_loss']
+    def add_transaction(self, t: Transaction):
+        """
+        Appends a transaction. A purchase or sale dated on or after everything seen so far only updates the open
+        lots and running totals; a back-dated one (or, with FIFO, a purchase that earlier unmatched sales would
+        have used, or with wash_sales, a purchase that replaces shares of a recent loss sale) makes the next
+        calculate_capital_gains re-match the full history.
+        """
+        if not self._owns_transactions:
+            # never append to the caller's list
+            transactions = self._transactions
+            self._transactions = transactions.to_transactions() if hasattr(transactions, 'to_transactions') \
+                else list(transactions)
+            self._owns_transactions = True
+            if self._ledger is None:
+                self._gains = None
+        self._transactions.append(t)
+        if self._gains is None:
+            return
+        if self.wash_sales:
+            last_loss_date = self._ledger.last_loss_date if self._ledger is not None else None
+            rematch = t.operation == Operation.BUY and last_loss_date is not None and \
+                t.date.toordinal() <= last_loss_date.toordinal() + WASH_SALE_DAYS
+        else:
+            rematch = self.method == LotRelief.FIFO and t.operation == Operation.BUY and self._unmatched_quantity > 0
+        if (self._last_key is not None and _chronological_key(t) < self._last_key) or rematch:
+            self.invalidate()
+            return
+        self._apply(t)
 
-        long_term_rate = get_long_term_rate(itx.income, itx.filing_status)
-        short_term_rate = get_short_term_rate(itx.income, itx.filing_status)
+    def add_many(self, transactions: Iterable[Transaction]):
+        for t in transactions:
+            self.add_transaction(t)
 
+    def tax_due(self, itx: IncomeTax):
+        gains_and_losses = self.calculate_capital_gains()
         if self.verbose:
             print("Gains Losses Details:")
             for gl in gains_and_losses:
                 print(gl)
-            print(f"long_term_gain_loss = ${long_term_gain_loss:,}")
-            print(f"long_term_rate = {long_term_rate*100:.1f}%")
-            print(f"NIIT rate = {my_niit_rate*100:.1f}%")
-            print(f"short_term_gain_loss = ${short_term_gain_loss:,}")
-            print(f"short_term_rate = ${short_term_rate*100:.1f}%")
-
-        tax_owed = 0
-        if long_term_gain_loss > 0:
-            rate = long_term_rate + my_niit_rate
-            tax_owed += long_term_gain_loss * rate
-        else:
-            # it is a loss, offset short-term gain
-            short_term_gain_loss += long_term_gain_loss
-
-        if short_term_gain_loss > 0:
-            tax_owed += short_term_gain_loss * short_term_rate
-        elif short_term_gain_loss < 0:
-            tax_owed = max(-3000, short_term_gain_loss)
-            if short_term_gain_loss < -3000:
-                print(f"short-term loss carry-over: {short_term_gain_loss + 3000:,}", file=sys.stderr)
-        return round(tax_owed, 2)
+        return tax_on_gains(gains_and_losses.short_term_gain_loss, gains_and_losses.long_term_gain_loss, itx,
+                            verbose=self.verbose, stack_gains=self.stack_gains)
 
 
 def unit_test():
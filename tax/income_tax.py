@@ -1,4 +1,6 @@
 from enum import Enum
+from functools import cached_property
+from bisect import bisect_left, bisect_right
 from collections import namedtuple
 
 TaxAmount = namedtuple('TaxAmount', ['amount', 'rate', 'tax'])
@@ -53,49 +55,225 @@ income_tax_brackets = {
 ALL_FILING_STATUS = [k.value for k in income_tax_brackets]
 
 
+class BracketSchedule:
+    def __init__(self, brackets):
+        """
+        Compiles a list of (lower, upper, rate) brackets, sorted by lower bound, into lookup tables.
+        thresholds[k] is the income at which bracket k starts when amounts are stacked bracket after bracket
+        (each bracket holds upper - lower + 1), and cumulative_tax[k] is the tax owed on all income below it.
+        net_thresholds[k] is the after-tax amount at thresholds[k], used by income_for_net.
+        """
+        self.lower_bounds = tuple(lower_bound for lower_bound, _, _ in brackets)
+        self.upper_bounds = tuple(upper_bound for _, upper_bound, _ in brackets)
+        self.rates = tuple(rate for _, _, rate in brackets)
+        thresholds = [0]
+        cumulative_tax = [0]
+        for lower_bound, upper_bound, rate in brackets[:-1]:
+            width = upper_bound - lower_bound + 1
+            thresholds.append(thresholds[-1] + width)
+            cumulative_tax.append(cumulative_tax[-1] + width * rate)
+        self.thresholds = tuple(thresholds)
+        self.cumulative_tax = tuple(cumulative_tax)
+        self.net_thresholds = tuple(t - c for t, c in zip(self.thresholds, self.cumulative_tax))
+
+    @classmethod
+    def from_tables(cls, lower_bounds, upper_bounds, rates, thresholds, cumulative_tax):
+        """
+        Rebuilds a schedule from tables compiled earlier, e.g. loaded from a cache, without recompiling them.
+        """
+        schedule = cls.__new__(cls)
+        schedule.lower_bounds = tuple(lower_bounds)
+        schedule.upper_bounds = tuple(upper_bounds)
+        schedule.rates = tuple(rates)
+        schedule.thresholds = tuple(thresholds)
+        schedule.cumulative_tax = tuple(cumulative_tax)
+        schedule.net_thresholds = tuple(t - c for t, c in zip(schedule.thresholds, schedule.cumulative_tax))
+        return schedule
+
+    def __len__(self):
+        return len(self.rates)
+
+    def rate_at(self, value):
+        """
+        Returns the rate of the first bracket with lower <= value <= upper, or None if value falls between brackets.
+        """
+        k = bisect_left(self.upper_bounds, value)
+        if k < len(self.rates) and value >= self.lower_bounds[k]:
+            return self.rates[k]
+        return None
+
+    def bracket_index(self, income):
+        """
+        Returns the index of the bracket the last dollar of income falls into.
+        """
+        return max(bisect_right(self.thresholds, income) - 1, 0)
+
+    def marginal_rate(self, income):
+        return self.rates[self.bracket_index(income)]
+
+    def tax(self, income):
+        if income <= 0:
+            return 0
+        k = self.bracket_index(income)
+        return self.cumulative_tax[k] + (income - self.thresholds[k]) * self.rates[k]
+
+    def income_for_net(self, net):
+        """
+        Inverse of income - tax(income): the income that leaves net after tax, solved in closed form
+        within the bracket found by one bisect over the after-tax amount at each threshold.
+        """
+        if net <= 0:
+            return net
+        k = max(bisect_right(self.net_thresholds, net) - 1, 0)
+        return self.thresholds[k] + (net - self.net_thresholds[k]) / (1 - self.rates[k])
+
+    def details(self, income):
+        """
+        Returns the per-bracket breakdown of the tax on income as a list of TaxAmount.
+        """
+        tax_amounts = list()
+        if income <= 0:
+            return tax_amounts
+        k = self.bracket_index(income)
+        for i in range(k):
+            taxable_in_bracket = self.thresholds[i + 1] - self.thresholds[i]
+            tax_amounts.append(TaxAmount(taxable_in_bracket, self.rates[i], taxable_in_bracket * self.rates[i]))
+        taxable_in_bracket = income - self.thresholds[k]
+        if taxable_in_bracket > 0:
+            tax_amounts.append(TaxAmount(taxable_in_bracket, self.rates[k], taxable_in_bracket * self.rates[k]))
+        return tax_amounts
+
+
+income_tax_schedules = {status: BracketSchedule(brackets) for status, brackets in income_tax_brackets.items()}
+
+
+def select_schedule(built_in_schedules, schedule, filing_status: FilingStatus, tax_year=None):
+    """
+    built_in_schedules[filing_status] when tax_year is None, else the registry's schedule (e.g. "income") for
+    tax_year, see schedules.get_schedule.
+    """
+    if tax_year is None:
+        return built_in_schedules[filing_status]
+    from .schedules import get_schedule
+
+    return get_schedule(tax_year, schedule, filing_status)
+
+
 class IncomeTax:
-    def __init__(self, income, filing_status: FilingStatus, verbose=False):
+    def __init__(self, income, filing_status: FilingStatus, verbose=False, tax_year=None):
+        """
+        tax_year selects the brackets of that year from the schedule registry; None uses income_tax_brackets.
+        """
         self._income = income
         self._filing_status = filing_status
+        self._tax_year = tax_year
         self.verbose = verbose
 
     @property
     def income(self):
         return self._income
 
+    @income.setter
+    def income(self, income):
+        self._income = income
+        self.invalidate()
+
     @property
     def filing_status(self):
         return self._filing_status
 
+    @filing_status.setter
+    def filing_status(self, filing_status: FilingStatus):
+        self._filing_status = filing_status
+        self.invalidate()
+
     @property
+    def tax_year(self):
+        return self._tax_year
+
+    @tax_year.setter
+    def tax_year(self, tax_year):
+        self._tax_year = tax_year
+        self.invalidate()
+
+    @property
+    def schedule(self):
+        return select_schedule(income_tax_schedules, "income", self.filing_status, self.tax_year)
+
+    def invalidate(self):
+        """
+        Drops the memoized tax_details, tax_due and average_tax_rate so they are recomputed on next access.
+        """
+        for name in ('tax_details', 'tax_due', 'average_tax_rate'):
+            self.__dict__.pop(name, None)
+
+    @cached_property
     def tax_details(self):
-        remaining_income = self.income
-        tax_amounts = list()
-        for lower_bound, upper_bound, rate in income_tax_brackets[self.filing_status]:
-            if remaining_income <= 0:
-                break
-
-            taxable_in_bracket = min(remaining_income, upper_bound - lower_bound + 1) if upper_bound != float('inf') \
-                else remaining_income
-            tax_amount = taxable_in_bracket * rate
-            remaining_income -= taxable_in_bracket
-            tax_amounts.append(TaxAmount(taxable_in_bracket, rate, tax_amount))
-            if self.verbose:
-                print(f"{taxable_in_bracket:,}\t@{rate*100:.1f}% = ${tax_amount:.2f}")
+        tax_amounts = self.schedule.details(self.income)
+        if self.verbose:
+            for ta in tax_amounts:
+                print(f"{ta.amount:,}\t@{ta.rate*100:.1f}% = ${ta.tax:.2f}")
         return tax_amounts
 
-    @property
+    @cached_property
     def tax_due(self):
-        tax_due = 0
-        for ta in self.tax_details:
-            tax_due += ta.tax
-        return tax_due
+        if self.verbose:
+            # print the per-bracket breakdown
+            self.tax_details
+        return self.schedule.tax(self.income)
 
-    @property
+    @cached_property
     def average_tax_rate(self):
         return round(self.tax_due/self.income, 3)
 
 
+def _read_rows(f, input_format):
+    if input_format == "csv":
+        import csv
+
+        yield from csv.DictReader(f)
+    else:
+        import json
+
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def run_batch(infile, outfile, input_format="csv", output_format="csv", chunk_size=100000,
+              default_filing_status=FilingStatus.SINGLE.value):
+    """
+    Streams rows with an "income" and an optional "filing_status" field from infile to outfile,
+    adding "tax_due" and "average_tax_rate", chunk_size rows at a time through the vectorized engine.
+    """
+    import json
+    from itertools import islice
+    from .vectorized import income_tax_batch
+
+    rows = _read_rows(infile, input_format)
+    if output_format == "csv":
+        import csv
+
+        writer = csv.writer(outfile)
+        writer.writerow(["income", "filing_status", "tax_due", "average_tax_rate"])
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        incomes = [float(row["income"]) for row in chunk]
+        statuses = [row.get("filing_status") or default_filing_status for row in chunk]
+        tax_due, average_tax_rate = income_tax_batch(incomes, statuses)
+        # zero incomes have no average rate
+        average_tax_rate = [None if rate != rate else rate for rate in average_tax_rate.tolist()]
+        results = zip(incomes, statuses, tax_due.tolist(), average_tax_rate)
+        if output_format == "csv":
+            writer.writerows(results)
+        else:
+            outfile.writelines(json.dumps({"income": income, "filing_status": status, "tax_due": tax,
+                                           "average_tax_rate": rate}) + "\n"
+                               for income, status, tax, rate in results)
+
+
 def cli():
     import argparse
 
@@ -103,10 +281,33 @@ def cli():
     parser.add_argument("--income", type=int, default=100000, required=False)
     parser.add_argument("--filing_status", choices=ALL_FILING_STATUS, default=FilingStatus.SINGLE.value)
     parser.add_argument("--verbose", action="store_true", required=False)
+    parser.add_argument("--input", help="batch mode: CSV/JSONL file of income[,filing_status] rows, '-' for stdin")
+    parser.add_argument("--output", default="-", help="batch mode: output file, '-' for stdout")
+    parser.add_argument("--input_format", choices=["csv", "jsonl"], default=None,
+                        help="defaults to the input file extension, csv for stdin")
+    parser.add_argument("--output_format", choices=["csv", "jsonl"], default=None,
+                        help="defaults to the input format")
+    parser.add_argument("--chunk_size", type=int, default=100000)
     args = parser.parse_args()
     if args.verbose:
         print(args)
 
+    if args.input is not None:
+        import sys
+
+        input_format = args.input_format or ("jsonl" if args.input.endswith((".jsonl", ".json")) else "csv")
+        output_format = args.output_format or input_format
+        infile = sys.stdin if args.input == "-" else open(args.input, newline="")
+        outfile = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+        try:
+            run_batch(infile, outfile, input_format, output_format, args.chunk_size, args.filing_status)
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+            if outfile is not sys.stdout:
+                outfile.close()
+        return
+
     itx = IncomeTax(args.income, FilingStatus(args.filing_status), verbose=args.verbose)
     print(f"Income ${itx.income:,} using filing status '{itx.filing_status}': "
           f"Tax due is ${itx.tax_due:,} and average tax rate: {itx.average_tax_rate*100:.1f}%")
@@ -114,5 +315,3 @@ def cli():
 
 if __name__ == "__main__":
     cli()
-
-
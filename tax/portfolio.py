@@ -0,0 +1,83 @@
+import os
+from collections import defaultdict
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+
+from .capital_gain_tax import CapitalGainTax, LotRelief, Transaction, tax_on_gains
+from .income_tax import IncomeTax
+
+
+def group_by_symbol(transactions: Iterable[Transaction]):
+    """
+    Splits transactions into one list per Transaction.symbol in a single pass, keeping their order.
+    """
+    by_symbol = defaultdict(list)
+    for t in transactions:
+        by_symbol[t.symbol].append(t)
+    return dict(by_symbol)
+
+
+def _match_symbol(transactions, method=LotRelief.FIFO, wash_sales=False):
+    return CapitalGainTax(transactions, method=method, wash_sales=wash_sales).calculate_capital_gains()
+
+
+def _match_symbol_totals(transactions, method=LotRelief.FIFO, wash_sales=False):
+    gains_and_losses = _match_symbol(transactions, method, wash_sales)
+    return gains_and_losses.short_term_gain_loss, gains_and_losses.long_term_gain_loss
+
+
+class PortfolioCapitalGainTax:
+    def __init__(self, transactions: Iterable[Transaction], max_workers=None, verbose=False,
+                 method: LotRelief = LotRelief.FIFO, stack_gains=False, wash_sales=False):
+        """
+        Capital gains for a portfolio of many securities. Lots are matched per symbol with the given method,
+        on a process pool of max_workers processes (None uses every CPU, 1 matches in this process).
+        stack_gains and wash_sales as in CapitalGainTax; wash sales are matched within each symbol.
+        """
+        self._by_symbol = group_by_symbol(transactions)
+        self.max_workers = max_workers
+        self.verbose = verbose
+        self.method = method
+        self.stack_gains = stack_gains
+        self.wash_sales = wash_sales
+
+    @property
+    def symbols(self):
+        return list(self._by_symbol)
+
+    def _map(self, fn):
+        fn = partial(fn, method=self.method, wash_sales=self.wash_sales)
+        symbols = self.symbols
+        if self.max_workers == 1 or len(symbols) < 2:
+            return dict(zip(symbols, map(fn, self._by_symbol.values())))
+        max_workers = self.max_workers or os.cpu_count() or 1
+        # a few chunks per worker keeps the pool busy without pickling one task per symbol
+        chunksize = max(1, len(symbols) // (4 * max_workers))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(symbols, executor.map(fn, self._by_symbol.values(), chunksize=chunksize)))
+
+    def calculate_capital_gains(self):
+        """
+        Returns a dict of symbol -> RealizedGains.
+        """
+        return self._map(_match_symbol)
+
+    def realized_gains(self):
+        """
+        Returns the short-term and long-term totals over all symbols as a tuple.
+        Workers only send back their totals, not the individual gains.
+        """
+        short_term_gain_loss = 0
+        long_term_gain_loss = 0
+        for symbol, (short_term, long_term) in self._map(_match_symbol_totals).items():
+            if self.verbose:
+                print(f"{symbol}: short_term_gain_loss = ${short_term:,}, long_term_gain_loss = ${long_term:,}")
+            short_term_gain_loss += short_term
+            long_term_gain_loss += long_term
+        return short_term_gain_loss, long_term_gain_loss
+
+    def tax_due(self, itx: IncomeTax):
+        short_term_gain_loss, long_term_gain_loss = self.realized_gains()
+        return tax_on_gains(short_term_gain_loss, long_term_gain_loss, itx, verbose=self.verbose,
+                            stack_gains=self.stack_gains)
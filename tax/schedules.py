@@ -0,0 +1,143 @@
+"""
+Registry of bracket schedules by (tax year, jurisdiction, schedule, filing status), loaded from data files laid
+out as <data dir>/<jurisdiction>/<tax year>.json (or .toml):
+
+    {"tax_year": 2024, "jurisdiction": "federal",
+     "schedules": {"income": {"single": [[0, 11160, 0.10], ..., [609351, null, 0.37]], ...}, ...}}
+
+An upper bound of null (JSON) or inf (TOML) means no upper bound. Compiled schedules are cached as .npz files
+named after the SHA-256 of COMPILE_VERSION and the data file, so an edited file (or a new compile format) is
+recompiled and an unchanged one is not re-parsed. Pass tax_year to IncomeTax, SocialSecurityTax, the rate functions
+of capital_gain_tax or the vectorized kernels to use a year from the registry instead of the built-in tables.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from .income_tax import BracketSchedule, FilingStatus
+
+DATA_DIR = Path(__file__).parent / "data"
+DEFAULT_CACHE_DIR = Path(os.environ.get("RETIRE_CACHE_DIR", Path.home() / ".cache" / "retire"))
+DATA_EXTENSIONS = (".json", ".toml")
+# part of the cache key: bump whenever _compile or BracketSchedule's tables change, so old .npz files are not served
+COMPILE_VERSION = 1
+
+
+def _parse(path: Path, content: bytes):
+    if path.suffix == ".toml":
+        import tomllib
+
+        return tomllib.loads(content.decode())
+    return json.loads(content)
+
+
+def _compile(document):
+    """
+    Returns {(schedule, filing status value): BracketSchedule} for a parsed data file.
+    """
+    compiled = dict()
+    for schedule, by_status in document["schedules"].items():
+        for status, brackets in by_status.items():
+            brackets = [(lower_bound, float('inf') if upper_bound is None else upper_bound, rate)
+                        for lower_bound, upper_bound, rate in brackets]
+            compiled[(schedule, FilingStatus(status).value)] = BracketSchedule(brackets)
+    return compiled
+
+
+def _save_cache(path: Path, compiled):
+    tables = {f"{schedule}/{status}": np.array([s.lower_bounds, s.upper_bounds, s.rates, s.thresholds,
+                                                 s.cumulative_tax], dtype=np.float64)
+              for (schedule, status), s in compiled.items()}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp.npz")
+    np.savez(tmp_path, **tables)
+    os.replace(tmp_path, path)
+
+
+def _load_cache(path: Path):
+    compiled = dict()
+    with np.load(path) as tables:
+        for key in tables.files:
+            schedule, status = key.split("/")
+            compiled[(schedule, status)] = BracketSchedule.from_tables(*tables[key].tolist())
+    return compiled
+
+
+class ScheduleRegistry:
+    def __init__(self, data_dirs=(DATA_DIR,), cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Indexes the data files under data_dirs by file name only; a file is read the first time one of its
+        schedules is requested. cache_dir=None disables the compiled cache.
+        """
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self._files = dict()
+        self._compiled = dict()
+        for data_dir in data_dirs:
+            for path in sorted(Path(data_dir).glob("*/*")):
+                if path.suffix in DATA_EXTENSIONS and path.stem.isdigit():
+                    self._files[(int(path.stem), path.parent.name)] = path
+
+    def tax_years(self, jurisdiction="federal"):
+        return sorted(year for year, j in self._files if j == jurisdiction)
+
+    def jurisdictions(self):
+        return sorted({j for _, j in self._files})
+
+    def _load(self, tax_year, jurisdiction):
+        key = (tax_year, jurisdiction)
+        if key not in self._compiled:
+            if key not in self._files:
+                raise KeyError(f"No tax schedules for tax_year={tax_year}, jurisdiction={jurisdiction}")
+            path = self._files[key]
+            content = path.read_bytes()
+            cache_path = None
+            if self.cache_dir is not None:
+                digest = hashlib.sha256(f"compile-v{COMPILE_VERSION}\n".encode() + content).hexdigest()
+                cache_path = self.cache_dir / f"{digest}.npz"
+            if cache_path is not None and cache_path.exists():
+                self._compiled[key] = _load_cache(cache_path)
+            else:
+                self._compiled[key] = _compile(_parse(path, content))
+                if cache_path is not None:
+                    try:
+                        _save_cache(cache_path, self._compiled[key])
+                    except OSError:
+                        # a read-only cache only costs the recompile next time
+                        pass
+        return self._compiled[key]
+
+    def get(self, tax_year, schedule, filing_status, jurisdiction="federal"):
+        """
+        Returns the BracketSchedule for e.g. get(2024, "income", FilingStatus.SINGLE).
+        """
+        status = filing_status.value if isinstance(filing_status, FilingStatus) else FilingStatus(filing_status).value
+        compiled = self._load(tax_year, jurisdiction)
+        if (schedule, status) not in compiled:
+            raise KeyError(f"No {schedule} schedule for tax_year={tax_year}, jurisdiction={jurisdiction}, "
+                           f"filing_status={status}")
+        return compiled[(schedule, status)]
+
+    def load_all(self, jurisdiction=None):
+        """
+        Loads every indexed file, e.g. ahead of a backtest over many tax years.
+        """
+        for tax_year, j in self._files:
+            if jurisdiction is None or j == jurisdiction:
+                self._load(tax_year, j)
+
+
+_default_registry = None
+
+
+def default_registry():
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ScheduleRegistry()
+    return _default_registry
+
+
+def get_schedule(tax_year, schedule, filing_status, jurisdiction="federal"):
+    return default_registry().get(tax_year, schedule, filing_status, jurisdiction)
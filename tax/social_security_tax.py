@@ -1,4 +1,4 @@
-from income_tax import FilingStatus
+from .income_tax import FilingStatus, BracketSchedule, select_schedule
 
 social_security_tax_brackets = {
     FilingStatus.SINGLE: [
@@ -23,15 +23,28 @@ social_security_tax_brackets = {
     ],
 }
 
+social_security_tax_schedules = {status: BracketSchedule(brackets)
+                                 for status, brackets in social_security_tax_brackets.items()}
+
+
+def benefit_taxation_parameters(filing_status: FilingStatus, tax_year=None):
+    """
+    Returns (base amount, adjusted base amount, first rate, second rate) of the benefits worksheet,
+    read from the first three brackets of social_security_tax_brackets (or tax_year's, see select_schedule).
+    """
+    schedule = select_schedule(social_security_tax_schedules, "social_security", filing_status, tax_year)
+    return schedule.upper_bounds[0], schedule.upper_bounds[1], schedule.rates[1], schedule.rates[2]
+
 
 def calculate_combined_income(adjusted_gross_income=0.0, non_taxable_interest=0.0, social_security_benefit=0.0):
     return round(adjusted_gross_income + non_taxable_interest + 0.5*social_security_benefit, 2)
 
 
 class SocialSecurityTax:
-    def __init__(self, combined_income, filing_status: FilingStatus, verbose=False):
+    def __init__(self, combined_income, filing_status: FilingStatus, verbose=False, tax_year=None):
         self._combined_income = combined_income
         self._filing_status = filing_status
+        self.tax_year = tax_year
         self.verbose = verbose
 
     @property
@@ -43,10 +56,25 @@ class SocialSecurityTax:
         return self._filing_status
 
     def taxable_percentage(self, digits=1):
-        for lower_bound, upper_bound, fraction in social_security_tax_brackets[self.filing_status]:
-            if upper_bound >= self.combined_income >= lower_bound:
-                if self.verbose:
-                    print(f"For combined income ${self.combined_income:,} using filing status '{itx.filing_status}': "
-                          f" social security income tax percentage is {fraction * 100:.1f}%")
-                return round(fraction, digits)
+        fraction = select_schedule(social_security_tax_schedules, "social_security", self.filing_status,
+                                   self.tax_year).rate_at(self.combined_income)
+        if fraction is not None:
+            if self.verbose:
+                print(f"For combined income ${self.combined_income:,} using filing status '{self.filing_status}': "
+                      f" social security income tax percentage is {fraction * 100:.1f}%")
+            return round(fraction, digits)
 
+    def taxable_benefits(self, social_security_benefit):
+        """
+        Taxable part of social_security_benefit per the IRS benefits worksheet, the lesser-of formulas across both
+        base amounts applied to self.combined_income (which must already include half of the benefit).
+        """
+        base_amount, adjusted_base_amount, first_rate, second_rate = benefit_taxation_parameters(self.filing_status,
+                                                                                                 self.tax_year)
+        if self.combined_income <= base_amount:
+            return 0
+        if self.combined_income <= adjusted_base_amount:
+            return min(first_rate * social_security_benefit, first_rate * (self.combined_income - base_amount))
+        return min(second_rate * social_security_benefit,
+                   second_rate * (self.combined_income - adjusted_base_amount) +
+                   min(first_rate * social_security_benefit, first_rate * (adjusted_base_amount - base_amount)))
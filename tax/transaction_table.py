@@ -0,0 +1,139 @@
+from datetime import date
+from typing import Iterable
+
+import numpy as np
+
+from .capital_gain_tax import Operation, Transaction, RealizedGains
+
+OPERATION_CODES = {Operation.BUY: 0, Operation.SELL: 1}
+OPERATIONS = {code: operation for operation, code in OPERATION_CODES.items()}
+
+GAIN_DTYPE = np.dtype([
+    ('sale_date', np.int64),
+    ('purchase_date', np.int64),
+    ('quantity', np.float64),
+    ('cost_basis', np.float64),
+    ('sale_proceeds', np.float64),
+    ('gain_loss', np.float64),
+    ('long_term', np.bool_),
+    ('wash_sale_disallowed', np.float64),
+])
+
+
+class TransactionRecord:
+    """
+    Read-only view of one row of a TransactionTable.
+    """
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    @property
+    def date(self):
+        return date.fromordinal(int(self._table.dates[self._index]))
+
+    @property
+    def operation(self):
+        return OPERATIONS[int(self._table.operations[self._index])]
+
+    @property
+    def quantity(self):
+        return float(self._table.quantities[self._index])
+
+    @property
+    def price(self):
+        return float(self._table.prices[self._index])
+
+    def to_transaction(self):
+        return Transaction(self.date, self.operation, self.quantity, self.price)
+
+    def __repr__(self):
+        return f"TransactionRecord(date={self.date}, operation={self.operation}, quantity={self.quantity}, " \
+               f"price={self.price})"
+
+
+class TransactionTable:
+    def __init__(self, dates, operations, quantities, prices):
+        """
+        Columnar store of transactions: dates as int64 day ordinals (date.toordinal()), operations as uint8 codes
+        from OPERATION_CODES, quantities and prices as float64.
+        """
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.operations = np.asarray(operations, dtype=np.uint8)
+        self.quantities = np.asarray(quantities, dtype=np.float64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        if not len(self.dates) == len(self.operations) == len(self.quantities) == len(self.prices):
+            raise ValueError("All columns of a TransactionTable must have the same length.")
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction]):
+        transactions = list(transactions)
+        n = len(transactions)
+        return cls(np.fromiter((t.date.toordinal() for t in transactions), dtype=np.int64, count=n),
+                   np.fromiter((OPERATION_CODES[t.operation] for t in transactions), dtype=np.uint8, count=n),
+                   np.fromiter((t.quantity for t in transactions), dtype=np.float64, count=n),
+                   np.fromiter((t.price for t in transactions), dtype=np.float64, count=n))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError("TransactionTable index out of range")
+        return TransactionRecord(self, index % len(self))
+
+    def __iter__(self):
+        return (TransactionRecord(self, i) for i in range(len(self)))
+
+    def to_transactions(self):
+        return [record.to_transaction() for record in self]
+
+    def _sorted_rows(self, operation: Operation):
+        rows = np.flatnonzero(self.operations == OPERATION_CODES[operation])
+        return rows[np.argsort(self.dates[rows], kind='stable')]
+
+    def fifo_capital_gains(self):
+        """
+        FIFO matching of sales against purchases, same rules as CapitalGainTax.calculate_fifo_capital_gains,
+        run directly on the columns. Returns RealizedGains backed by a structured array of GAIN_DTYPE,
+        one row per lot used by a sale.
+        """
+        buys = self._sorted_rows(Operation.BUY)
+        sales = self._sorted_rows(Operation.SELL)
+        buy_dates = self.dates[buys].tolist()
+        buy_quantities = self.quantities[buys].tolist()
+        buy_prices = self.prices[buys].tolist()
+
+        # every match uses up either a sale or a purchase lot
+        gains = np.empty(len(buys) + len(sales), dtype=GAIN_DTYPE)
+        n = 0
+        i = 0
+        short_term_gain_loss = 0
+        long_term_gain_loss = 0
+        lot_quantity = buy_quantities[0] if buy_quantities else 0
+        for sale_date, sale_quantity, sale_price in zip(self.dates[sales].tolist(),
+                                                        self.quantities[sales].tolist(),
+                                                        self.prices[sales].tolist()):
+            remaining_sale_quantity = sale_quantity
+            while remaining_sale_quantity > 0 and i < len(buy_quantities):
+                matched_quantity = min(remaining_sale_quantity, lot_quantity)
+                cost_basis = matched_quantity * buy_prices[i]
+                sale_proceeds = matched_quantity * sale_price
+                gain_or_loss = sale_proceeds - cost_basis
+                long_term = sale_date - buy_dates[i] > 365
+                gains[n] = (sale_date, buy_dates[i], matched_quantity, cost_basis, sale_proceeds, gain_or_loss,
+                            long_term, 0.0)
+                n += 1
+                if long_term:
+                    long_term_gain_loss += gain_or_loss
+                else:
+                    short_term_gain_loss += gain_or_loss
+                remaining_sale_quantity -= matched_quantity
+                if lot_quantity > matched_quantity: # if purchase is not fully used
+                    lot_quantity -= matched_quantity
+                else:
+                    i += 1
+                    lot_quantity = buy_quantities[i] if i < len(buy_quantities) else 0
+        return RealizedGains.from_numpy(gains[:n], short_term_gain_loss, long_term_gain_loss)
@@ -0,0 +1,246 @@
+from collections import namedtuple
+from functools import lru_cache, partial
+
+import numpy as np
+
+from .capital_gain_tax import NIIT_RATE, long_term_tax_schedules, niit_thresholds
+from .income_tax import FilingStatus, income_tax_schedules, select_schedule
+from .social_security_tax import benefit_taxation_parameters
+
+RateCurve = namedtuple('RateCurve', ['income', 'marginal_rate', 'effective_rate', 'tax_due'])
+
+
+def _compile_schedule(schedule):
+    """
+    Converts a BracketSchedule into the arrays used by the batch kernels.
+    """
+    return (np.array(schedule.thresholds, dtype=np.float64), np.array(schedule.rates, dtype=np.float64),
+            np.array(schedule.cumulative_tax, dtype=np.float64))
+
+
+def _by_status(kernel, filing_status, *values):
+    """
+    Applies kernel(*values, status) to each group of elements sharing a filing status.
+    """
+    values = [np.asarray(v, dtype=np.float64) for v in values]
+    if isinstance(filing_status, (FilingStatus, str)):
+        return kernel(*np.broadcast_arrays(*values), filing_status)
+
+    statuses = np.asarray(filing_status)
+    if statuses.dtype == object:
+        statuses = np.asarray([_as_filing_status(s).value for s in statuses.ravel()]).reshape(statuses.shape)
+    *values, statuses = np.broadcast_arrays(*values, statuses)
+    result = np.empty(statuses.shape, dtype=np.float64)
+    for status in np.unique(statuses):
+        mask = statuses == status
+        result[mask] = kernel(*(v[mask] for v in values), status)
+    return result
+
+
+_built_in_schedules = {"income": income_tax_schedules, "long_term": long_term_tax_schedules}
+
+
+def _as_filing_status(status):
+    return status if isinstance(status, FilingStatus) else FilingStatus(status)
+
+
+@lru_cache(maxsize=None)
+def _schedule_tables(schedule, filing_status: FilingStatus, tax_year):
+    """
+    Kernel tables of schedule ("income" or "long_term") for one filing status and tax year, compiled once:
+    (thresholds, rates, cumulative tax, upper bounds).
+    """
+    compiled = select_schedule(_built_in_schedules[schedule], schedule, filing_status, tax_year)
+    return _compile_schedule(compiled) + (np.array(compiled.upper_bounds, dtype=np.float64),)
+
+
+def _income_tax_tables(filing_status, tax_year=None):
+    return _schedule_tables("income", _as_filing_status(filing_status), tax_year)[:3]
+
+
+def _long_term_tax_tables(filing_status, tax_year=None):
+    return _schedule_tables("long_term", _as_filing_status(filing_status), tax_year)
+
+
+def _bracket_tax(incomes, tables):
+    starts, rates, cumulative_tax = tables
+    incomes = np.maximum(incomes, 0)
+    idx = np.searchsorted(starts, incomes, side='right') - 1
+    return cumulative_tax[idx] + (incomes - starts[idx]) * rates[idx]
+
+
+def _tax_due(incomes, filing_status, tax_year=None):
+    return _bracket_tax(incomes, _income_tax_tables(filing_status, tax_year))
+
+
+def tax_due_array(incomes, filing_status, tax_year=None):
+    """
+    Vectorized IncomeTax.tax_due.
+    filing_status is either a single FilingStatus (or its value) or an array of them, one per income.
+    tax_year selects that year's brackets from the schedule registry, as in IncomeTax; None uses the built-in ones.
+    """
+    return _by_status(partial(_tax_due, tax_year=tax_year), filing_status, incomes)
+
+
+def _long_term_rate(incomes, filing_status, tax_year=None):
+    _, rates, _, upper_bounds = _long_term_tax_tables(filing_status, tax_year)
+    # first bracket whose upper bound reaches the income, as get_long_term_rate
+    idx = np.searchsorted(upper_bounds, incomes, side='left')
+    return rates[np.minimum(idx, len(rates) - 1)]
+
+
+def long_term_rate_array(incomes, filing_status, tax_year=None):
+    """
+    Vectorized get_long_term_rate, except that incomes between two brackets get the rate of the next one.
+    """
+    return _by_status(partial(_long_term_rate, tax_year=tax_year), filing_status, incomes)
+
+
+def _long_term_tax(incomes, gains, filing_status, tax_year=None):
+    tables = _long_term_tax_tables(filing_status, tax_year)[:3]
+    gains = np.maximum(gains, 0)
+    return _bracket_tax(incomes + gains, tables) - _bracket_tax(incomes, tables)
+
+
+def long_term_tax_array(incomes, long_term_gains, filing_status, tax_year=None):
+    """
+    Vectorized stacked_long_term_tax: tax on each long-term gain stacked on top of its ordinary income, as the
+    difference of the long-term schedule's prefix sums at the top and bottom of the stack. Arrays broadcast.
+    """
+    return _by_status(partial(_long_term_tax, tax_year=tax_year), filing_status, incomes, long_term_gains)
+
+
+def _niit_rate(incomes, filing_status):
+    return np.where(incomes > niit_thresholds[_as_filing_status(filing_status)], NIIT_RATE, 0.0)
+
+
+def niit_rate_array(incomes, filing_status):
+    """
+    Vectorized niit_rate.
+    """
+    return _by_status(_niit_rate, filing_status, incomes)
+
+
+def average_tax_rate_array(incomes, filing_status, tax=None, tax_year=None):
+    """
+    Vectorized IncomeTax.average_tax_rate. Zero incomes give nan.
+    """
+    incomes = np.asarray(incomes, dtype=np.float64)
+    if tax is None:
+        tax = tax_due_array(incomes, filing_status, tax_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.round(tax / incomes, 3)
+
+
+def income_tax_batch(incomes, filing_status, tax_year=None):
+    """
+    Returns (tax_due, average_tax_rate) arrays for an array of incomes in one pass.
+    """
+    tax = tax_due_array(incomes, filing_status, tax_year)
+    return tax, average_tax_rate_array(incomes, filing_status, tax=tax)
+
+
+def _income_for_net(nets, filing_status, tax_year=None):
+    starts, rates, cumulative_tax = _income_tax_tables(filing_status, tax_year)
+    net_starts = starts - cumulative_tax
+    idx = np.maximum(np.searchsorted(net_starts, nets, side='right') - 1, 0)
+    return np.where(nets <= 0, nets, starts[idx] + (nets - net_starts[idx]) / (1 - rates[idx]))
+
+
+def income_for_net_array(nets, filing_status, tax_year=None):
+    """
+    Gross income needed to keep each after-tax amount in nets, i.e. the inverse of income - tax_due.
+    Solved per bracket in closed form, filing_status as in tax_due_array.
+    """
+    return _by_status(partial(_income_for_net, tax_year=tax_year), filing_status, nets)
+
+
+def _marginal_rate(incomes, filing_status, tax_year=None):
+    starts, rates, _ = _income_tax_tables(filing_status, tax_year)
+    return rates[np.searchsorted(starts, np.maximum(incomes, 0), side='right') - 1]
+
+
+def marginal_rate_array(incomes, filing_status, tax_year=None):
+    """
+    Rate on the next dollar of each income, filing_status as in tax_due_array.
+    """
+    return _by_status(partial(_marginal_rate, tax_year=tax_year), filing_status, incomes)
+
+
+def income_grid(start, stop, step):
+    """
+    Incomes from start to stop inclusive, step apart.
+    """
+    return np.arange(start, stop + step / 2, step, dtype=np.float64)
+
+
+def rate_curves(incomes, filing_statuses=tuple(FilingStatus), breakpoints=True, tax_year=None):
+    """
+    Returns {filing status: RateCurve} over the sorted incomes. With breakpoints, each bracket threshold inside
+    the income range is added to the grid, so the curves are exact without oversampling; the marginal rate at a
+    threshold is the rate of the bracket starting there. Effective rates are unrounded, nan at zero income.
+    """
+    if isinstance(filing_statuses, (FilingStatus, str)):
+        filing_statuses = [filing_statuses]
+    incomes = np.unique(np.asarray(incomes, dtype=np.float64))
+    curves = dict()
+    for filing_status in map(_as_filing_status, filing_statuses):
+        grid = incomes
+        if breakpoints and len(incomes):
+            starts = _income_tax_tables(filing_status, tax_year)[0]
+            grid = np.union1d(incomes, starts[(starts >= incomes[0]) & (starts <= incomes[-1])])
+        tax = _tax_due(grid, filing_status, tax_year)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            effective_rate = tax / grid
+        curves[filing_status] = RateCurve(grid, _marginal_rate(grid, filing_status, tax_year), effective_rate, tax)
+    return curves
+
+
+def _taxable_benefits(benefits, combined_incomes, filing_status, tax_year=None):
+    return _benefit_tiers(benefits, combined_incomes,
+                          *benefit_taxation_parameters(_as_filing_status(filing_status), tax_year))
+
+
+def _benefit_tiers(benefits, combined_incomes, base_amount, adjusted_base_amount, first_rate, second_rate):
+    """
+    Taxable benefits for the given benefit taxation parameters, which broadcast like the benefits.
+    """
+    first_tier = np.minimum(first_rate * benefits, first_rate * np.maximum(combined_incomes - base_amount, 0))
+    second_tier = np.minimum(second_rate * benefits,
+                             second_rate * (combined_incomes - adjusted_base_amount) +
+                             np.minimum(first_rate * benefits, first_rate * (adjusted_base_amount - base_amount)))
+    return np.where(combined_incomes > adjusted_base_amount, second_tier, first_tier)
+
+
+def taxable_benefits_array(social_security_benefits, filing_status, adjusted_gross_incomes=0.0,
+                           non_taxable_interest=0.0, tax_year=None):
+    """
+    Vectorized SocialSecurityTax.taxable_benefits: taxable part of each benefit, with the combined income built
+    as in calculate_combined_income. All arrays broadcast together, filing_status as in tax_due_array.
+    """
+    benefits = np.asarray(social_security_benefits, dtype=np.float64)
+    combined_incomes = np.round(np.asarray(adjusted_gross_incomes, dtype=np.float64) + non_taxable_interest +
+                                0.5 * benefits, 2)
+    return _by_status(partial(_taxable_benefits, tax_year=tax_year), filing_status, benefits, combined_incomes)
+
+
+def household_tax_array(ordinary_incomes, long_term_gains, filing_status, social_security_benefits=0.0,
+                        stack_gains=False, tax_year=None):
+    """
+    Federal tax of each household: income tax on ordinary income plus the taxable part of Social Security, and
+    long-term gains taxed at long_term_rate_array + niit_rate_array of that income, as tax_on_gains does.
+    With stack_gains the gains are taxed by long_term_tax_array instead, NIIT unchanged.
+    Gains count toward the combined income of the benefits worksheet. Arrays broadcast together.
+    tax_year as in tax_due_array; NIIT thresholds are not in the registry and stay the built-in ones.
+    """
+    ordinary_incomes = np.asarray(ordinary_incomes, dtype=np.float64)
+    long_term_gains = np.asarray(long_term_gains, dtype=np.float64)
+    incomes = ordinary_incomes + taxable_benefits_array(social_security_benefits, filing_status,
+                                                        ordinary_incomes + long_term_gains, tax_year=tax_year)
+    if stack_gains:
+        gains_tax = (long_term_tax_array(incomes, long_term_gains, filing_status, tax_year) +
+                     long_term_gains * niit_rate_array(incomes, filing_status))
+    else:
+        gains_tax = long_term_gains * (long_term_rate_array(incomes, filing_status, tax_year) +
+                                       niit_rate_array(incomes, filing_status))
+    return tax_due_array(incomes, filing_status, tax_year) + gains_tax
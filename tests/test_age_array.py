@@ -0,0 +1,36 @@
+import unittest
+
+import numpy as np
+
+from finance.age_array import AgeArray
+from finance.constants import Age
+
+
+class AgeArrayTest(unittest.TestCase):
+    ages = [Age(0, 13, 0), Age(0, 0, 45), Age(1, 0, 25), Age(3, 2, 1)]
+
+    def test_matches_age_for_unnormalized_ages(self):
+        ages = AgeArray.from_ages(self.ages)
+        self.assertEqual(ages.in_months().tolist(), [age.in_months() for age in self.ages])
+        self.assertEqual(ages.to_ages(), self.ages)
+        self.assertEqual([ages[i] for i in range(len(ages))], self.ages)
+        self.assertEqual((ages == Age(1, 0, 25)).tolist(), [age == Age(1, 0, 25) for age in self.ages])
+        self.assertEqual((ages <= Age(1, 0, 25)).tolist(), [age <= Age(1, 0, 25) for age in self.ages])
+
+    def test_differences_are_normalized(self):
+        ages = AgeArray.from_ages(self.ages) - Age(0, 1, 0)
+        self.assertEqual(ages.to_ages(), [age - Age(0, 1, 0) for age in self.ages])
+        self.assertEqual(ages.in_months().tolist(), [(age - Age(0, 1, 0)).in_months() for age in self.ages])
+
+    def test_rejects_non_integers(self):
+        for years, months in ((1.5, 0), (1, [0.5, 1]), (1, -1)):
+            with self.assertRaises(ValueError):
+                AgeArray.from_components(years, months)
+            with self.assertRaises(ValueError):
+                Age(years, months if np.ndim(months) == 0 else months[0])
+        self.assertEqual(AgeArray.from_components([1, 2], np.array([3, 4], dtype=np.int64)).to_ages(),
+                         [Age(1, 3, 0), Age(2, 4, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import random
+import unittest
+from datetime import date, timedelta
+
+from tax.capital_gain_tax import (CapitalGainTax, LotRelief, Operation, Transaction, get_long_term_rate,
+                                  stacked_long_term_tax, tax_on_gains)
+from tax.income_tax import FilingStatus, IncomeTax
+from tax.transaction_table import TransactionTable
+from tax.vectorized import long_term_tax_array
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class ToArrowTest(unittest.TestCase):
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_dates_and_amounts(self):
+        transactions = [
+            Transaction(date(2023, 1, 15), Operation.BUY, 100, 20.0),
+            Transaction(date(2024, 3, 1), Operation.SELL, 60, 25.0),
+        ]
+        table = CapitalGainTax(transactions).calculate_capital_gains().to_arrow()
+        self.assertEqual(table.schema.field('sale_date').type, pyarrow.date32())
+        self.assertEqual(table.column('sale_date').to_pylist(), [date(2024, 3, 1)])
+        self.assertEqual(table.column('purchase_date').to_pylist(), [date(2023, 1, 15)])
+        self.assertEqual(table.column('gain_loss').to_pylist(), [300.0])
+        self.assertEqual(table.column('long_term').to_pylist(), [True])
+
+
+class StackedLongTermTaxTest(unittest.TestCase):
+    def test_thresholds_match_get_long_term_rate(self):
+        for filing_status in FilingStatus:
+            for income in (40000, 97600, 97601, 300000, 600500, 600600):
+                self.assertAlmostEqual(stacked_long_term_tax(income, 1, filing_status),
+                                       get_long_term_rate(income, filing_status))
+
+    def test_straddling_gain(self):
+        filing_status = FilingStatus.MARRIED_JOINTLY
+        self.assertAlmostEqual(stacked_long_term_tax(600600, 100, filing_status), 20.0)
+        self.assertAlmostEqual(stacked_long_term_tax(590000, 20000, filing_status), 10501 * 0.15 + 9499 * 0.20)
+        self.assertAlmostEqual(long_term_tax_array([590000], [20000], filing_status)[0], 10501 * 0.15 + 9499 * 0.20)
+
+    def test_stacks_on_net_short_term_gain(self):
+        itx = IncomeTax(40000, FilingStatus.SINGLE)
+        expected = stacked_long_term_tax(50000, 20000, FilingStatus.SINGLE) + 10000 * 0.12
+        self.assertAlmostEqual(tax_on_gains(10000, 20000, itx, stack_gains=True), expected)
+
+
+def _buy(day, quantity, price):
+    return Transaction(date(2024, 1, 1) + timedelta(days=day), Operation.BUY, quantity, price)
+
+
+def _sell(day, quantity, price):
+    return Transaction(date(2024, 1, 1) + timedelta(days=day), Operation.SELL, quantity, price)
+
+
+def _random_transactions(rng, n):
+    transactions, held, day = [], 0, 0
+    for _ in range(n):
+        day += rng.randint(0, 20)
+        if held and rng.random() < 0.45:
+            quantity = rng.randint(1, held)
+            held -= quantity
+            transactions.append(_sell(day, quantity, rng.uniform(10, 100)))
+        else:
+            quantity = rng.randint(1, 50)
+            held += quantity
+            transactions.append(_buy(day, quantity, rng.uniform(10, 100)))
+    return transactions
+
+
+class WashSaleTest(unittest.TestCase):
+    def gains(self, transactions, **kwargs):
+        return list(CapitalGainTax(transactions, wash_sales=True, **kwargs).calculate_capital_gains())
+
+    def test_loss_deferred_to_replacement(self):
+        first, second = self.gains([_buy(0, 100, 50.0), _sell(10, 100, 40.0), _buy(20, 100, 42.0),
+                                    _sell(100, 100, 45.0)])
+        self.assertEqual((first.gain_loss, first.wash_sale_disallowed), (0.0, 1000.0))
+        self.assertEqual((second.purchase_date, second.cost_basis, second.gain_loss),
+                         (date(2024, 1, 21), 5200.0, -700.0))
+
+    def test_holding_period_carried_over(self):
+        gains = self.gains([_buy(0, 100, 50.0), _sell(300, 100, 40.0), _buy(310, 100, 42.0), _sell(400, 100, 45.0)])
+        self.assertFalse(gains[0].long_term)
+        # held 90 days, plus the 300 days of the shares it replaced
+        self.assertTrue(gains[1].long_term)
+        self.assertFalse(CapitalGainTax([_buy(310, 100, 42.0), _sell(400, 100, 45.0)])
+                         .calculate_capital_gains()[0].long_term)
+
+    def test_partial_replacement_bought_before_sale(self):
+        first, second = self.gains([_buy(0, 100, 50.0), _buy(25, 30, 45.0), _sell(40, 100, 40.0),
+                                    _sell(400, 30, 60.0)])
+        self.assertEqual((first.quantity, first.gain_loss, first.wash_sale_disallowed), (100, -700.0, 300.0))
+        self.assertEqual((second.cost_basis, second.gain_loss), (1650.0, 150.0))
+        self.assertTrue(second.long_term)
+
+    def test_shares_sold_do_not_replace_themselves(self):
+        gain, = self.gains([_buy(0, 100, 50.0), _sell(10, 100, 40.0)])
+        self.assertEqual((gain.gain_loss, gain.wash_sale_disallowed), (-1000.0, 0.0))
+        first, second = self.gains([_buy(0, 100, 50.0), _buy(5, 50, 48.0), _sell(10, 100, 40.0),
+                                    _sell(20, 50, 45.0)])
+        self.assertEqual((first.gain_loss, first.wash_sale_disallowed), (-500.0, 500.0))
+        self.assertEqual((second.cost_basis, second.gain_loss, second.wash_sale_disallowed), (2900.0, -650.0, 0.0))
+
+    def test_gains_unchanged_without_wash_sales(self):
+        transactions = [_buy(0, 100, 50.0), _sell(10, 100, 40.0), _buy(20, 100, 42.0), _sell(100, 100, 45.0)]
+        gains = CapitalGainTax(transactions).calculate_capital_gains()
+        self.assertEqual([g.gain_loss for g in gains], [-1000.0, 300.0])
+        self.assertEqual([g.wash_sale_disallowed for g in gains], [0, 0])
+
+    def test_incremental_matches_full_rematch(self):
+        rng = random.Random(3)
+        for method in LotRelief:
+            for _ in range(20):
+                transactions = _random_transactions(rng, 40)
+                expected = CapitalGainTax(transactions, method=method, wash_sales=True).calculate_capital_gains()
+                incremental = CapitalGainTax(transactions[:5], method=method, wash_sales=True)
+                incremental.calculate_capital_gains()
+                for t in transactions[5:]:
+                    incremental.add_transaction(t)
+                    incremental.calculate_capital_gains()
+                gains = list(incremental.calculate_capital_gains())
+                self.assertEqual(len(gains), len(expected))
+                for got, want in zip(gains, expected):
+                    self.assertEqual(got[:3] + got[6:7], want[:3] + want[6:7])
+                    for a, b in zip(got[3:6] + got[7:], want[3:6] + want[7:]):
+                        self.assertAlmostEqual(a, b)
+                for gain in expected:
+                    self.assertGreaterEqual(gain.wash_sale_disallowed, 0)
+                    if gain.wash_sale_disallowed:
+                        self.assertLessEqual(gain.gain_loss, 1e-9)
+
+    def test_table_input_matches_list(self):
+        transactions = _random_transactions(random.Random(7), 60)
+        expected = CapitalGainTax(transactions, wash_sales=True).calculate_capital_gains()
+        gains = CapitalGainTax(TransactionTable.from_transactions(transactions),
+                               wash_sales=True).calculate_capital_gains()
+        self.assertEqual(len(gains), len(expected))
+        for got, want in zip(gains, expected):
+            self.assertEqual(tuple(got[:3]) + (bool(got[6]),), tuple(want[:3]) + (want[6],))
+            for a, b in zip(got[3:6] + got[7:], want[3:6] + want[7:]):
+                self.assertAlmostEqual(a, b)
+
+
+if __name__ == '__main__':
+    unittest.main()
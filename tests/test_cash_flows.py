@@ -0,0 +1,27 @@
+import unittest
+
+import numpy as np
+
+from finance.cash_flows import cash_flow_schedule
+from finance.constants import FREQ
+
+
+class CashFlowScheduleTest(unittest.TestCase):
+    def test_calendar_frequencies_compound_on_whole_periods(self):
+        flows = cash_flow_schedule('2024-01-01', '2063-12-31', FREQ.YEAR, 100.0, growth_rate=0.1)
+        self.assertEqual(len(flows.dates), 40)
+        np.testing.assert_allclose(flows.amounts, 100.0 * 1.1 ** np.arange(40), rtol=1e-12)
+
+        monthly = cash_flow_schedule('2024-01-31', '2025-12-31', FREQ.MONTH, 100.0, growth_rate=0.1)
+        self.assertEqual(str(monthly.dates[1]), '2024-02-29')
+        np.testing.assert_allclose(monthly.amounts[::12], [100.0, 110.0])
+        quarterly = cash_flow_schedule('2024-01-01', '2025-12-31', FREQ.QUARTER, 100.0, growth_rate=0.1)
+        np.testing.assert_allclose(quarterly.amounts[::4], [100.0, 110.0])
+
+    def test_day_frequencies_compound_on_days(self):
+        flows = cash_flow_schedule('2024-01-01', '2024-12-31', FREQ.WEEK, 100.0, growth_rate=0.1)
+        np.testing.assert_allclose(flows.amounts, 100.0 * 1.1 ** (np.arange(len(flows.dates)) * 7 / 365))
+
+
+if __name__ == '__main__':
+    unittest.main()
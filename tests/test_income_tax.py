@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+import unittest
+
+from tax.income_tax import FilingStatus, IncomeTax, run_batch
+
+
+class RunBatchTest(unittest.TestCase):
+    rows = [(50000, "single"), (120000, "married_jointly"), (0, ""), (75000, "head_of_household"), (30000, "")]
+
+    def expected(self, default_filing_status="single"):
+        for income, status in self.rows:
+            status = status or default_filing_status
+            itx = IncomeTax(income, FilingStatus(status))
+            yield income, status, itx.tax_due, itx.average_tax_rate if income else None
+
+    def test_csv_in_chunks(self):
+        infile = io.StringIO("income,filing_status\n" + "".join(f"{i},{s}\n" for i, s in self.rows))
+        outfile = io.StringIO()
+        run_batch(infile, outfile, chunk_size=2, default_filing_status="married_separately")
+        header, *rows = csv.reader(io.StringIO(outfile.getvalue()))
+        self.assertEqual(header, ["income", "filing_status", "tax_due", "average_tax_rate"])
+        self.assertEqual(len(rows), len(self.rows))
+        for row, (income, status, tax_due, rate) in zip(rows, self.expected("married_separately")):
+            self.assertEqual((float(row[0]), row[1]), (income, status))
+            self.assertAlmostEqual(float(row[2]), tax_due)
+            self.assertEqual(row[3], "" if rate is None else str(rate))
+
+    def test_jsonl(self):
+        infile = io.StringIO("".join(json.dumps({"income": i, **({"filing_status": s} if s else {})}) + "\n"
+                                     for i, s in self.rows) + "\n")
+        outfile = io.StringIO()
+        run_batch(infile, outfile, input_format="jsonl", output_format="jsonl", chunk_size=3)
+        results = [json.loads(line) for line in outfile.getvalue().splitlines()]
+        self.assertEqual(len(results), len(self.rows))
+        for result, (income, status, tax_due, rate) in zip(results, self.expected()):
+            self.assertEqual((result["income"], result["filing_status"]), (income, status))
+            self.assertAlmostEqual(result["tax_due"], tax_due)
+            self.assertEqual(result["average_tax_rate"], rate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+import numpy as np
+
+from finance.monte_carlo import BLOCK_SIZE, RetirementSimulation, run_parallel
+
+
+class RunParallelTest(unittest.TestCase):
+    def test_matches_run_for_any_worker_count(self):
+        simulation = RetirementSimulation(5, 60000, taxable=500000, taxable_basis=300000, tax_deferred=700000,
+                                          roth=100000, social_security_benefit=25000)
+        n_paths = 3 * BLOCK_SIZE + 100
+        expected = simulation.run(n_paths, seed=11)
+        for max_workers in (2, 3):
+            result = run_parallel(simulation, n_paths, seed=11, max_workers=max_workers)
+            for name, got, want in zip(expected._fields, result, expected):
+                self.assertTrue(np.array_equal(got, want), (max_workers, name))
+
+
+class InflationTest(unittest.TestCase):
+    def test_taxes_grow_with_inflation(self):
+        # with returns grown by inflation too, every nominal amount is the real one grown by inflation, and so are
+        # the taxes, as the brackets are indexed (a taxable account would not scale: its basis is not indexed)
+        kwargs = dict(years=20, spending=90000, tax_deferred=1500000, roth=100000, social_security_benefit=30000,
+                      other_income=10000)
+        real = RetirementSimulation(inflation=0.0, **kwargs)
+        nominal = RetirementSimulation(inflation=0.03, **kwargs)
+        returns = real.returns(500, seed=5, block=0)
+        growth = 1.03 ** np.arange(20)
+        expected = real.simulate(returns)
+        result = nominal.simulate((1 + returns) * 1.03 - 1)
+        np.testing.assert_allclose(result.taxes, expected.taxes * growth, rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(result.balances, expected.balances * growth * 1.03, rtol=1e-9, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from finance.roth_conversion import bracket_headroom, long_term_headroom, plan_roth_conversions
+from tax.capital_gain_tax import long_term_tax_schedules
+from tax.income_tax import FilingStatus, income_tax_schedules
+from tax.vectorized import taxable_benefits_array
+
+
+class HeadroomTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        n = 2000
+        self.incomes = rng.uniform(0, 250000, n)
+        self.benefits = rng.uniform(0, 50000, n)
+        self.gains = rng.uniform(0, 40000, n)
+        self.statuses = rng.choice(list(FilingStatus), n)
+        self.tops = {name: np.array([schedules[s].upper_bounds[:-1] for s in self.statuses])
+                     for name, schedules in (("income", income_tax_schedules), ("long_term", long_term_tax_schedules))}
+
+    def reached(self, headroom, stack_gains):
+        # taxable ordinary income, plus the gains if stacked, once each headroom is added
+        incomes = self.incomes[:, None] + headroom
+        reached = incomes + taxable_benefits_array(self.benefits[:, None], self.statuses[:, None],
+                                                   incomes + self.gains[:, None])
+        return reached + self.gains[:, None] if stack_gains else reached
+
+    def check_lands_on_tops(self, headroom, tops, stack_gains):
+        reached = self.reached(headroom, stack_gains)
+        open_brackets = headroom > 0
+        self.assertTrue(open_brackets.any())
+        np.testing.assert_allclose(reached[open_brackets], tops[open_brackets], rtol=0, atol=0.01)
+        # brackets already passed, with no headroom left
+        self.assertTrue(np.all(self.reached(np.zeros_like(headroom), stack_gains)[~open_brackets] >=
+                               tops[~open_brackets] - 0.01))
+
+    def test_bracket_headroom_lands_on_bracket_tops(self):
+        headroom = bracket_headroom(self.incomes, self.statuses, self.benefits, self.gains)
+        self.check_lands_on_tops(headroom, self.tops["income"], stack_gains=False)
+
+    def test_long_term_headroom_lands_on_bracket_tops(self):
+        headroom = long_term_headroom(self.incomes, self.statuses, self.benefits, self.gains)
+        self.check_lands_on_tops(headroom, self.tops["long_term"], stack_gains=True)
+
+    def test_array_matches_single_status(self):
+        headroom = bracket_headroom(self.incomes, self.statuses, self.benefits, self.gains)
+        for status in FilingStatus:
+            mask = self.statuses == status
+            np.testing.assert_array_equal(headroom[mask], bracket_headroom(self.incomes[mask], status,
+                                                                           self.benefits[mask], self.gains[mask]))
+            np.testing.assert_array_equal(headroom[mask], bracket_headroom(self.incomes[mask], status.value,
+                                                                           self.benefits[mask], self.gains[mask]))
+
+
+class PlanRothConversionsTest(unittest.TestCase):
+    def test_balances_cap_conversions(self):
+        incomes = np.array([[20000.0] * 5, [60000.0] * 5])
+        uncapped = plan_roth_conversions(incomes, FilingStatus.SINGLE, 2)
+        plan = plan_roth_conversions(incomes, FilingStatus.SINGLE, 2, tax_deferred_balances=[100000, 1e9])
+        self.assertAlmostEqual(plan.amounts[0].sum(), 100000)
+        np.testing.assert_allclose(np.cumsum(plan.amounts[0]), np.minimum(np.cumsum(uncapped.amounts[0]), 100000))
+        self.assertTrue(np.all(plan.amounts >= 0))
+        np.testing.assert_array_equal(plan.amounts[1], uncapped.amounts[1])
+        self.assertTrue(np.all(plan.tax_cost[0][plan.amounts[0] == 0] == 0))
+        self.assertTrue(np.all(plan.tax_cost[0] <= uncapped.tax_cost[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
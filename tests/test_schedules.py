@@ -0,0 +1,83 @@
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from tax.capital_gain_tax import get_long_term_rate, long_term_tax_schedules
+from tax.income_tax import FilingStatus, IncomeTax, income_tax_schedules
+from tax import schedules
+from tax.schedules import DATA_DIR, ScheduleRegistry
+from tax.social_security_tax import SocialSecurityTax, social_security_tax_schedules
+from tax.vectorized import household_tax_array, tax_due_array
+
+
+class BuiltInTablesTest(unittest.TestCase):
+    def test_data_file_matches_built_in_tables(self):
+        registry = ScheduleRegistry(cache_dir=None)
+        for name, built_in in (("income", income_tax_schedules), ("long_term", long_term_tax_schedules),
+                               ("social_security", social_security_tax_schedules)):
+            for filing_status in FilingStatus:
+                loaded = registry.get(2024, name, filing_status)
+                expected = built_in[filing_status]
+                self.assertEqual((loaded.lower_bounds, loaded.upper_bounds, loaded.rates),
+                                 (expected.lower_bounds, expected.upper_bounds, expected.rates), (name, filing_status))
+
+
+class TaxYearTest(unittest.TestCase):
+    def setUp(self):
+        # keep the default registry, which the tax_year APIs go through, out of the user's cache directory
+        patcher = mock.patch.object(schedules, "_default_registry", ScheduleRegistry(cache_dir=None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tax_year_uses_registry(self):
+        incomes = [0, 50000, 250000, 800000]
+        for filing_status in FilingStatus:
+            for income in incomes:
+                self.assertAlmostEqual(IncomeTax(income, filing_status, tax_year=2024).tax_due,
+                                       IncomeTax(income, filing_status).tax_due)
+                self.assertEqual(get_long_term_rate(income, filing_status, 2024),
+                                 get_long_term_rate(income, filing_status))
+                self.assertEqual(SocialSecurityTax(income, filing_status, tax_year=2024).taxable_benefits(30000),
+                                 SocialSecurityTax(income, filing_status).taxable_benefits(30000))
+            np.testing.assert_allclose(tax_due_array(incomes, filing_status, tax_year=2024),
+                                       tax_due_array(incomes, filing_status))
+            np.testing.assert_allclose(household_tax_array(incomes, 10000, filing_status, 30000, tax_year=2024),
+                                       household_tax_array(incomes, 10000, filing_status, 30000))
+
+    def test_unknown_tax_year(self):
+        with self.assertRaises(KeyError):
+            IncomeTax(50000, FilingStatus.SINGLE, tax_year=1900).tax_due
+
+
+class CacheTest(unittest.TestCase):
+    def test_cache_key_includes_compile_version(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            registry = ScheduleRegistry(cache_dir=cache_dir)
+            schedule = registry.get(2024, "income", FilingStatus.SINGLE)
+            content = (DATA_DIR / "federal" / "2024.json").read_bytes()
+            cached = list(Path(cache_dir).glob("*.npz"))
+            self.assertEqual(len(cached), 1)
+            self.assertNotEqual(cached[0].stem, hashlib.sha256(content).hexdigest())
+            reloaded = ScheduleRegistry(cache_dir=cache_dir).get(2024, "income", FilingStatus.SINGLE)
+            self.assertEqual(reloaded.thresholds, schedule.thresholds)
+
+    def test_loaded_once_per_registry(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            ScheduleRegistry(cache_dir=cache_dir).get(2024, "income", FilingStatus.SINGLE)
+            registry = ScheduleRegistry(cache_dir=cache_dir)
+            with mock.patch.object(schedules, "_load_cache", wraps=schedules._load_cache) as load_cache, \
+                    mock.patch.object(schedules, "_compile", wraps=schedules._compile) as compile_:
+                first = registry.get(2024, "income", FilingStatus.SINGLE)
+                for _ in range(3):
+                    self.assertIs(registry.get(2024, "income", FilingStatus.SINGLE), first)
+                registry.get(2024, "long_term", FilingStatus.MARRIED_JOINTLY)
+            self.assertEqual(load_cache.call_count, 1)
+            self.assertEqual(compile_.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+
+from tax.income_tax import FilingStatus, IncomeTax, income_tax_schedules
+from tax.social_security_tax import SocialSecurityTax, benefit_taxation_parameters, calculate_combined_income
+from tax.vectorized import (income_for_net_array, income_grid, income_tax_batch, rate_curves, tax_due_array,
+                            taxable_benefits_array)
+
+# incomes on and around every bracket start, plus a spread in between
+INCOMES = np.unique(np.concatenate([np.linspace(0, 1_000_000, 401)] +
+                                   [np.add.outer(income_tax_schedules[status].thresholds, [-1, 0, 1]).ravel()
+                                    for status in FilingStatus]))
+INCOMES = INCOMES[INCOMES >= 0]
+
+
+class TaxDueArrayTest(unittest.TestCase):
+    def test_matches_income_tax(self):
+        for filing_status in FilingStatus:
+            expected = [IncomeTax(income, filing_status).tax_due for income in INCOMES]
+            np.testing.assert_allclose(tax_due_array(INCOMES, filing_status), expected, rtol=1e-12, atol=1e-9)
+            np.testing.assert_allclose(tax_due_array(INCOMES, filing_status.value), expected, rtol=1e-12, atol=1e-9)
+
+    def test_status_arrays(self):
+        statuses = np.resize(list(FilingStatus), len(INCOMES))
+        expected = [IncomeTax(income, status).tax_due for income, status in zip(INCOMES, statuses)]
+        np.testing.assert_allclose(tax_due_array(INCOMES, statuses), expected, rtol=1e-12, atol=1e-9)
+        np.testing.assert_allclose(tax_due_array(INCOMES, [s.value for s in statuses]), expected, rtol=1e-12,
+                                   atol=1e-9)
+
+    def test_average_tax_rate(self):
+        incomes = INCOMES[INCOMES > 0]
+        tax, average_tax_rate = income_tax_batch(incomes, FilingStatus.MARRIED_JOINTLY)
+        np.testing.assert_allclose(average_tax_rate, [IncomeTax(income, FilingStatus.MARRIED_JOINTLY).average_tax_rate
+                                                      for income in incomes])
+        self.assertTrue(np.isnan(income_tax_batch([0.0], FilingStatus.SINGLE)[1][0]))
+
+
+class RateCurvesTest(unittest.TestCase):
+    def test_breakpoints(self):
+        incomes = income_grid(0, 700000, 25000)
+        for filing_status, curve in rate_curves(incomes).items():
+            schedule = income_tax_schedules[filing_status]
+            starts = [t for t in schedule.thresholds if t <= 700000]
+            self.assertEqual(set(curve.income), set(incomes) | set(starts))
+            self.assertTrue(np.all(np.diff(curve.income) > 0))
+            for start, rate in zip(schedule.thresholds, schedule.rates):
+                if start <= 700000:
+                    i = np.searchsorted(curve.income, start)
+                    self.assertEqual(curve.marginal_rate[i], rate)
+                    if i:
+                        self.assertLess(curve.marginal_rate[i - 1], rate)
+            np.testing.assert_allclose(curve.tax_due, [schedule.tax(income) for income in curve.income])
+            np.testing.assert_allclose(curve.effective_rate[1:], curve.tax_due[1:] / curve.income[1:])
+            self.assertTrue(np.isnan(curve.effective_rate[0]))
+
+    def test_without_breakpoints(self):
+        incomes = income_grid(0, 700000, 25000)
+        curve = rate_curves(incomes, FilingStatus.SINGLE, breakpoints=False)[FilingStatus.SINGLE]
+        np.testing.assert_array_equal(curve.income, incomes)
+
+
+class TaxableBenefitsArrayTest(unittest.TestCase):
+    def test_matches_social_security_tax(self):
+        rng = np.random.default_rng(4)
+        benefits = rng.uniform(0, 60000, 300)
+        interest = rng.uniform(0, 2000, 300)
+        for filing_status in FilingStatus:
+            agis = rng.uniform(0, 80000, 300)
+            # combined incomes on each base amount too
+            agis[:2] = np.array(benefit_taxation_parameters(filing_status)[:2]) - interest[:2] - benefits[:2] / 2
+            expected = [SocialSecurityTax(calculate_combined_income(agi, i, b), filing_status).taxable_benefits(b)
+                        for agi, i, b in zip(agis, interest, benefits)]
+            np.testing.assert_allclose(taxable_benefits_array(benefits, filing_status, agis, interest), expected,
+                                       rtol=1e-12, atol=1e-9)
+
+    def test_status_arrays(self):
+        statuses = np.resize(list(FilingStatus), 8)
+        benefits = np.full(8, 30000.0)
+        agis = np.linspace(10000, 60000, 8)
+        expected = [SocialSecurityTax(calculate_combined_income(agi, 0, 30000), status).taxable_benefits(30000)
+                    for agi, status in zip(agis, statuses)]
+        np.testing.assert_allclose(taxable_benefits_array(benefits, statuses, agis), expected)
+
+
+class IncomeForNetTest(unittest.TestCase):
+    def test_round_trip(self):
+        for filing_status in FilingStatus:
+            schedule = income_tax_schedules[filing_status]
+            nets = INCOMES - tax_due_array(INCOMES, filing_status)
+            incomes = income_for_net_array(nets, filing_status)
+            np.testing.assert_allclose(incomes, INCOMES, rtol=0, atol=1e-6)
+            for net, income in zip(nets[::7], INCOMES[::7]):
+                self.assertAlmostEqual(schedule.income_for_net(net), income, places=6)
+                self.assertAlmostEqual(schedule.income_for_net(net) - schedule.tax(schedule.income_for_net(net)),
+                                       net, places=6)
+
+    def test_non_positive_nets(self):
+        np.testing.assert_array_equal(income_for_net_array([-100.0, 0.0], FilingStatus.SINGLE), [-100.0, 0.0])
+        self.assertEqual(income_tax_schedules[FilingStatus.SINGLE].income_for_net(0), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
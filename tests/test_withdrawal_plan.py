@@ -0,0 +1,26 @@
+import unittest
+
+import numpy as np
+
+from finance.withdrawal_plan import WithdrawalOptimizer
+
+
+class WithdrawalOptimizerTest(unittest.TestCase):
+    def test_spends_taxed_accounts_before_running_short(self):
+        plan = WithdrawalOptimizer(30, 60000, tax_deferred=1_000_000, roth=0).optimize()
+        # the Roth account is empty, so every Roth withdrawal is a shortfall
+        np.testing.assert_allclose(plan.roth, plan.shortfalls)
+        first_short = np.argmax(plan.shortfalls > 0.01)
+        self.assertGreater(first_short, 10)
+        # money runs out within a year of the first shortfall, and none is left unspent
+        self.assertTrue(np.all(plan.balances[first_short + 1:] < 1.0))
+
+    def test_roth_within_balance_is_not_a_shortfall(self):
+        plan = WithdrawalOptimizer(20, 50000, tax_deferred=300_000, taxable=200_000, roth=400_000,
+                                   social_security_benefit=20000).optimize()
+        self.assertLess(plan.shortfalls.max(), 0.01)
+        self.assertGreater(plan.balances[-1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()